@@ -1,22 +1,47 @@
-from fastapi import FastAPI, HTTPException, Query, UploadFile, File
+from fastapi import FastAPI, HTTPException, Query, UploadFile, File, Request, Response, Header
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse, FileResponse
+from starlette.datastructures import Headers, MutableHeaders
 from pydantic import BaseModel, EmailStr, Field
-from typing import Optional, List
+from typing import Optional, List, Dict, NamedTuple
+from collections import OrderedDict
+from contextvars import ContextVar
 from motor.motor_asyncio import AsyncIOMotorClient
 from dotenv import load_dotenv
-from datetime import datetime, timezone
+from datetime import datetime, timezone, timedelta, date
+from pymongo import InsertOne, ReturnDocument, UpdateOne, monitoring
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+from bson import ObjectId
 import os
+import sys
+import socket
 import httpx
 import asyncio
 import uuid
+import re
+import json
+import random
+import bisect
+import threading
 import cloudinary
 import cloudinary.utils
 import time
+import gzip
+import hashlib
+import hmac
+import zlib
+import orjson
+import numpy as np
 import resend
 
+try:
+    import brotli
+except ImportError:  # gzip-only compression
+    brotli = None
+
 load_dotenv()
 
-app = FastAPI(title="Jewellery Platform API")
+app = FastAPI(title="Jewellery Platform API", default_response_class=ORJSONResponse)
 
 app.add_middleware(
     CORSMiddleware,
@@ -46,17 +71,422 @@ SENDER_EMAIL = os.environ.get("SENDER_EMAIL", "onboarding@resend.dev")
 TELEGRAM_BOT_TOKEN = os.environ.get("TELEGRAM_BOT_TOKEN")
 TELEGRAM_CHAT_ID = os.environ.get("TELEGRAM_CHAT_ID")
 
+# Upstream simulation setup: live | simulate | record | replay, per upstream overridable
+# (e.g. UPSTREAM_MODE=simulate, UPSTREAM_MODE_LLM=replay)
+UPSTREAM_MODE = os.environ.get("UPSTREAM_MODE", "live")
+UPSTREAM_SIMULATION_CONFIG = os.environ.get("UPSTREAM_SIMULATION_CONFIG")  # JSON file of profile overrides
+UPSTREAM_SIMULATION_SEED = os.environ.get("UPSTREAM_SIMULATION_SEED", "0")
+# Recorded fixtures hold customer contact details and chat text: keep them out of the repo
+UPSTREAM_FIXTURES_DIR = os.environ.get("UPSTREAM_FIXTURES_DIR", "/tmp/jewellery-fixtures")
+
+# Admin setup (admin endpoints are disabled until a key is configured)
+ADMIN_API_KEY = os.environ.get("ADMIN_API_KEY")
+
+# Gold price refresh setup (one elected refresher across all workers/replicas)
+PRICE_REFRESH_SECONDS = float(os.environ.get("PRICE_REFRESH_SECONDS", "60"))
+PRICE_LEASE_SECONDS = float(os.environ.get("PRICE_LEASE_SECONDS", "180"))
+PRICE_POLL_SECONDS = float(os.environ.get("PRICE_POLL_SECONDS", "5"))
+PRICE_LEASE_ID = "gold_price_refresher"
+BASE_CURRENCY = "INR"
+PRICE_CURRENCIES = list(dict.fromkeys(
+    [BASE_CURRENCY] + [c.strip().upper() for c in os.environ.get("PRICE_CURRENCIES", "INR,USD,AED").split(",") if c.strip()]
+))
+PRICE_FETCH_DEADLINE_SECONDS = float(os.environ.get("PRICE_FETCH_DEADLINE_SECONDS", "10"))
+
+# Catalogue index setup
+CATALOGUE_POLL_SECONDS = float(os.environ.get("CATALOGUE_POLL_SECONDS", "5"))
+
+# Chat session cache setup
+CHAT_CACHE_MAX_SESSIONS = int(os.environ.get("CHAT_CACHE_MAX_SESSIONS", "1000"))
+CHAT_CACHE_MAX_BYTES = int(os.environ.get("CHAT_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+CHAT_CACHE_IDLE_SECONDS = float(os.environ.get("CHAT_CACHE_IDLE_SECONDS", "900"))
+
+# Request profiler setup (middleware is not installed at all unless enabled)
+PROFILER_ENABLED = os.environ.get("PROFILER_ENABLED", "").lower() in ("1", "true", "yes")
+PROFILER_SAMPLE_RATE = float(os.environ.get("PROFILER_SAMPLE_RATE", "0"))
+PROFILER_PATHS = [p for p in os.environ.get("PROFILER_PATHS", "/api/").split(",") if p]
+PROFILER_INTERVAL_MS = float(os.environ.get("PROFILER_INTERVAL_MS", "2"))
+PROFILER_DIR = os.environ.get("PROFILER_DIR", "/tmp/jewellery-profiles")
+PROFILER_RING_SIZE = int(os.environ.get("PROFILER_RING_SIZE", "50"))
+
+# Response compression setup
+COMPRESSION_MIN_BYTES = int(os.environ.get("COMPRESSION_MIN_BYTES", "1024"))
+
+# Write-behind buffer setup (chat history, price ticks and analytics rollups)
+WRITE_BUFFER_BATCH_SIZE = int(os.environ.get("WRITE_BUFFER_BATCH_SIZE", "500"))
+WRITE_BUFFER_MAX_PENDING = int(os.environ.get("WRITE_BUFFER_MAX_PENDING", "5000"))
+WRITE_BUFFER_FLUSH_SECONDS = float(os.environ.get("WRITE_BUFFER_FLUSH_SECONDS", "1"))
+
+# Education content cache setup
+EDUCATION_REFRESH_SECONDS = float(os.environ.get("EDUCATION_REFRESH_SECONDS", "300"))
+EDUCATION_MAX_AGE = int(os.environ.get("EDUCATION_MAX_AGE", "3600"))
+
 @app.on_event("startup")
 async def startup_db_client():
+    # Per process, after any fork (e.g. gunicorn --preload imports once in the master)
+    app.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
     app.mongodb_client = AsyncIOMotorClient(MONGO_URL)
     app.mongodb = app.mongodb_client[DB_NAME]
     # Seed initial data
     await seed_initial_data()
+    # Build in-memory catalogue indexes, then load the latest shared price snapshot
+    await reload_catalogue_indexes()
+    await sync_price_snapshot()
+    await load_education_bundle()
+    app.background_tasks = [
+        asyncio.create_task(price_refresh_loop()),
+        asyncio.create_task(catalogue_sync_loop()),
+        asyncio.create_task(education_refresh_loop()),
+        asyncio.create_task(write_buffer_loop())
+    ]
 
 @app.on_event("shutdown")
 async def shutdown_db_client():
+    for task in app.background_tasks:
+        task.cancel()
+    await asyncio.gather(*app.background_tasks, return_exceptions=True)
+    await write_buffer.flush_all()
+    await release_price_lease()
     app.mongodb_client.close()
 
+# ==================== RESPONSE SERIALIZATION ====================
+
+def negotiate_encoding(accept_encoding: str) -> Optional[str]:
+    """Pick br or gzip from an Accept-Encoding header"""
+    accepted = set()
+    for token in accept_encoding.lower().split(","):
+        coding, _, params = token.strip().partition(";")
+        if params.strip().replace(" ", "") in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+            continue
+        accepted.add(coding.strip())
+    if brotli is not None and "br" in accepted:
+        return "br"
+    if "gzip" in accepted or "*" in accepted:
+        return "gzip"
+    return None
+
+def compress_body(body: bytes, encoding: str) -> bytes:
+    """Compress a response body with the negotiated encoding"""
+    if encoding == "br":
+        return brotli.compress(body, quality=4)
+    return gzip.compress(body, compresslevel=6)
+
+class CompressionMiddleware:
+    """Compress buffered responses above a size threshold with br or gzip"""
+
+    def __init__(self, app, minimum_size: int = 1024):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = negotiate_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if not encoding:
+            await self.app(scope, receive, send)
+            return
+
+        start_message = None
+        chunks = []
+
+        async def compressing_send(message):
+            nonlocal start_message
+            if message["type"] == "http.response.start":
+                start_message = message
+                return
+            if message["type"] != "http.response.body":
+                await send(message)
+                return
+            chunks.append(message.get("body", b""))
+            if message.get("more_body", False):
+                return
+            body = b"".join(chunks)
+            headers = MutableHeaders(raw=start_message["headers"])
+            if len(body) >= self.minimum_size and "content-encoding" not in headers:
+                body = compress_body(body, encoding)
+                headers["Content-Encoding"] = encoding
+                headers["Content-Length"] = str(len(body))
+                headers.add_vary_header("Accept-Encoding")
+            await send(start_message)
+            await send({"type": "http.response.body", "body": body})
+
+        await self.app(scope, receive, compressing_send)
+
+app.add_middleware(CompressionMiddleware, minimum_size=COMPRESSION_MIN_BYTES)
+
+# ==================== REQUEST PROFILER ====================
+
+# Set only while a profiled request runs; Motor copies context into its executor threads
+current_profile: ContextVar = ContextVar("current_profile", default=None)
+PROFILE_ID = re.compile(r"^[0-9]{8}T[0-9]{12}Z-[0-9a-f]{6}$")
+
+class RequestProfile:
+    """Stack samples of the event loop thread plus awaited Mongo/upstream spans"""
+
+    def __init__(self, path: str):
+        self.profile_id = f"{datetime.now(timezone.utc):%Y%m%dT%H%M%S%fZ}-{uuid.uuid4().hex[:6]}"
+        self.path = path
+        self.handler = None
+        self.samples = []  # stacks as tuples of (function, file, line), root first
+        self.spans = []  # (kind, name, start_ms, duration_ms, ok)
+        self.pending = {}  # mongo request_id -> (name, start)
+        self.thread_id = threading.get_ident()
+        self.stopped = threading.Event()
+        self.started = time.perf_counter()
+        self.elapsed_ms = 0.0
+        self.sampler = threading.Thread(target=self.sample_loop, daemon=True)
+
+    def start(self):
+        self.started = time.perf_counter()
+        self.sampler.start()
+
+    def stop(self):
+        self.stopped.set()
+        self.sampler.join()
+        self.elapsed_ms = (time.perf_counter() - self.started) * 1000
+
+    def sample_loop(self):
+        # Samples whatever the loop thread runs, so concurrent requests can appear too
+        while not self.stopped.wait(PROFILER_INTERVAL_MS / 1000):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                stack.append((frame.f_code.co_name, frame.f_code.co_filename, frame.f_lineno))
+                frame = frame.f_back
+            stack.reverse()
+            self.samples.append(tuple(stack))
+
+    def add_span(self, kind: str, name: str, start: float, ok: bool):
+        self.spans.append((
+            kind, name, (start - self.started) * 1000, (time.perf_counter() - start) * 1000, ok
+        ))
+
+class ProfilerCommandListener(monitoring.CommandListener):
+    """Times Mongo commands issued on behalf of a profiled request"""
+
+    def started(self, event):
+        profile = current_profile.get()
+        if profile is not None:
+            collection = event.command.get(event.command_name)
+            target = f" {collection}" if isinstance(collection, str) else ""
+            profile.pending[event.request_id] = (f"{event.command_name}{target}", time.perf_counter())
+
+    def _finished(self, event, ok: bool):
+        profile = current_profile.get()
+        if profile is not None and event.request_id in profile.pending:
+            name, start = profile.pending.pop(event.request_id)
+            profile.add_span("mongo", name, start, ok)
+
+    def succeeded(self, event):
+        self._finished(event, True)
+
+    def failed(self, event):
+        self._finished(event, False)
+
+def speedscope_document(profile: RequestProfile) -> dict:
+    """speedscope file: one sampled profile plus evented lanes for awaited calls"""
+    frames = []
+    frame_index = {}
+    
+    def frame_id(name: str, file: Optional[str] = None, line: Optional[int] = None) -> int:
+        key = (name, file, line)
+        if key not in frame_index:
+            frame_index[key] = len(frames)
+            frames.append({"name": name, "file": file, "line": line} if file else {"name": name})
+        return frame_index[key]
+    
+    samples = [[frame_id(*frame) for frame in stack] for stack in profile.samples]
+    profiles = [{
+        "type": "sampled",
+        "name": f"{profile.handler} {profile.path}",
+        "unit": "milliseconds",
+        "startValue": 0,
+        "endValue": len(samples) * PROFILER_INTERVAL_MS,
+        "samples": samples,
+        "weights": [PROFILER_INTERVAL_MS] * len(samples)
+    }]
+    
+    # Concurrent spans overlap, so split them into non-overlapping lanes
+    lanes = []
+    for kind, name, start_ms, duration_ms, ok in sorted(profile.spans, key=lambda span: span[2]):
+        lane = next((lane for lane in lanes if lane[-1][2] + lane[-1][3] <= start_ms), None)
+        if lane is None:
+            lane = []
+            lanes.append(lane)
+        lane.append((kind, name, start_ms, duration_ms, ok))
+    for number, lane in enumerate(lanes, 1):
+        events = []
+        for kind, name, start_ms, duration_ms, ok in lane:
+            frame = frame_id(f"{kind}: {name}" + ("" if ok else " (failed)"))
+            events.append({"type": "O", "frame": frame, "at": start_ms})
+            events.append({"type": "C", "frame": frame, "at": start_ms + duration_ms})
+        profiles.append({
+            "type": "evented",
+            "name": f"awaited calls (lane {number})",
+            "unit": "milliseconds",
+            "startValue": 0,
+            "endValue": max(profile.elapsed_ms, events[-1]["at"]),
+            "events": events
+        })
+    
+    return {
+        "$schema": "https://www.speedscope.app/file-format-schema.json",
+        "name": f"{profile.handler} {profile.path} ({profile.elapsed_ms:.1f} ms)",
+        "exporter": "jewellery-platform",
+        "activeProfileIndex": 0,
+        "shared": {"frames": frames},
+        "profiles": profiles
+    }
+
+def write_profile(profile: RequestProfile):
+    """Write the profile, then trim the directory to the newest PROFILER_RING_SIZE files"""
+    os.makedirs(PROFILER_DIR, exist_ok=True)
+    with open(os.path.join(PROFILER_DIR, f"{profile.profile_id}.speedscope.json"), "wb") as f:
+        f.write(orjson.dumps(speedscope_document(profile)))
+    files = sorted(name for name in os.listdir(PROFILER_DIR) if name.endswith(".speedscope.json"))
+    for name in files[:-PROFILER_RING_SIZE]:
+        try:
+            os.remove(os.path.join(PROFILER_DIR, name))
+        except FileNotFoundError:
+            pass
+
+def should_profile(scope) -> bool:
+    """Admin header (requires ADMIN_API_KEY) or random sampling on chosen paths"""
+    headers = Headers(scope=scope)
+    if headers.get("x-profile") == "1":
+        return bool(ADMIN_API_KEY) and hmac.compare_digest(headers.get("x-admin-key") or "", ADMIN_API_KEY)
+    return (
+        PROFILER_SAMPLE_RATE > 0
+        and any(scope["path"].startswith(prefix) for prefix in PROFILER_PATHS)
+        and random.random() < PROFILER_SAMPLE_RATE
+    )
+
+class ProfilerMiddleware:
+    """Profile selected requests and point at the result with X-Profile-Id"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not should_profile(scope):
+            await self.app(scope, receive, send)
+            return
+        
+        profile = RequestProfile(scope["path"])
+        
+        async def send_with_profile_id(message):
+            if message["type"] == "http.response.start":
+                MutableHeaders(scope=message).append("X-Profile-Id", profile.profile_id)
+            await send(message)
+        
+        token = current_profile.set(profile)
+        profile.start()
+        try:
+            await self.app(scope, receive, send_with_profile_id)
+        finally:
+            profile.stop()
+            current_profile.reset(token)
+            # The router records the matched endpoint on the shared scope
+            profile.handler = getattr(scope.get("endpoint"), "__name__", "unmatched")
+            try:
+                await asyncio.to_thread(write_profile, profile)
+            except Exception as e:
+                print(f"Profile write error: {e}")
+
+if PROFILER_ENABLED:
+    monitoring.register(ProfilerCommandListener())
+    app.add_middleware(ProfilerMiddleware)
+    if not ADMIN_API_KEY:
+        print("Profiler enabled without ADMIN_API_KEY: profiles are written but cannot be downloaded")
+
+# ==================== WRITE-BEHIND BUFFER ====================
+
+class WriteBuffer:
+    """Batch non-critical writes per collection into unordered bulk writes.
+    
+    A collection flushes in the background once it has batch_size pending
+    operations, and on the interval loop otherwise. When max_pending is reached
+    (e.g. Mongo is down) add() waits for a flush instead of growing without bound,
+    while offer() drops the write.
+    
+    After an ambiguous failure (the batch may have been applied) only inserts
+    are retried: insert() gives each document its _id up front, so a repeat is
+    a duplicate-key error rather than a second copy. Updates such as $inc are
+    dropped instead of being applied twice.
+    """
+
+    def __init__(self, batch_size: int, max_pending: int):
+        self.batch_size = batch_size
+        self.max_pending = max_pending
+        self.pending: Dict[str, list] = {}
+        self.locks: Dict[str, asyncio.Lock] = {}
+        self.flush_tasks = set()
+
+    async def add(self, collection: str, *operations):
+        """Queue InsertOne/UpdateOne operations for a collection, waiting while it is full"""
+        while len(self.pending.get(collection, ())) >= self.max_pending:
+            if not await self.flush(collection):
+                await asyncio.sleep(WRITE_BUFFER_FLUSH_SECONDS)
+        self.enqueue(collection, operations)
+
+    async def insert(self, collection: str, *documents):
+        """Queue inserts with client-side _ids so retries cannot duplicate them"""
+        await self.add(collection, *(InsertOne({"_id": ObjectId(), **document}) for document in documents))
+
+    def offer(self, collection: str, *operations) -> bool:
+        """Queue without waiting; False (nothing queued) when the collection is full"""
+        if len(self.pending.get(collection, ())) + len(operations) > self.max_pending:
+            return False
+        self.enqueue(collection, operations)
+        return True
+
+    def enqueue(self, collection: str, operations):
+        queue = self.pending.setdefault(collection, [])
+        queue.extend(operations)
+        if len(queue) >= self.batch_size and not self.lock(collection).locked():
+            task = asyncio.create_task(self.flush(collection))
+            self.flush_tasks.add(task)
+            task.add_done_callback(self.flush_tasks.discard)
+
+    def lock(self, collection: str) -> asyncio.Lock:
+        return self.locks.setdefault(collection, asyncio.Lock())
+
+    async def flush(self, collection: str) -> bool:
+        """Write everything pending for one collection; False if it was put back"""
+        async with self.lock(collection):
+            operations = self.pending.pop(collection, [])
+            if not operations:
+                return True
+            try:
+                await app.mongodb[collection].bulk_write(operations, ordered=False)
+            except BulkWriteError as e:
+                # Unordered: everything else was applied, per-document failures are dropped;
+                # duplicate keys are retried inserts whose first attempt already landed
+                failed = [error for error in e.details.get("writeErrors", []) if error.get("code") != 11000]
+                if failed:
+                    print(f"Write buffer {collection} error: {len(failed)} writes failed")
+            except Exception as e:
+                # Possibly applied: retry only inserts, ahead of anything queued meanwhile
+                retry = [operation for operation in operations if isinstance(operation, InsertOne)]
+                print(f"Write buffer {collection} error: {e} ({len(operations) - len(retry)} updates dropped)")
+                self.pending[collection] = retry + self.pending.get(collection, [])
+                return False
+            return True
+
+    async def flush_all(self):
+        """Flush every collection (interval loop and shutdown)"""
+        for collection in list(self.pending):
+            await self.flush(collection)
+
+write_buffer = WriteBuffer(WRITE_BUFFER_BATCH_SIZE, WRITE_BUFFER_MAX_PENDING)
+
+async def write_buffer_loop():
+    """Flush buffered writes on an interval"""
+    while True:
+        await asyncio.sleep(WRITE_BUFFER_FLUSH_SECONDS)
+        await write_buffer.flush_all()
+
 # ==================== PYDANTIC MODELS ====================
 
 class GoldsmithProfile(BaseModel):
@@ -78,6 +508,9 @@ class GoldPrice(BaseModel):
     timestamp: str
     source: str = "manual"
 
+class GoldPriceQuote(GoldPrice):
+    currency: str = "INR"
+
 class JewelleryItem(BaseModel):
     item_id: str = Field(default_factory=lambda: str(uuid.uuid4())[:8])
     name: str
@@ -93,14 +526,26 @@ class JewelleryItem(BaseModel):
     description: str
     is_featured: bool = False
 
+class PriceAlertSubscription(BaseModel):
+    purity: str  # 24K, 22K, 18K, silver
+    direction: str  # below, above
+    threshold: float = Field(..., gt=0)  # per gram, INR
+    email: Optional[EmailStr] = None
+    telegram_chat_id: Optional[str] = None
+
+class OrderLine(BaseModel):
+    item_id: str
+    name: Optional[str] = None
+    estimate: Optional[float] = None  # client-side estimate, kept for reference only
+
 class OrderIntent(BaseModel):
     customer_name: str
     customer_email: EmailStr
     customer_phone: str
     occasion: str
     timeline: str
-    items: List[dict]
-    total_estimate: float
+    items: List[OrderLine] = Field(..., min_length=1)
+    total_estimate: Optional[float] = None  # re-priced server-side
     message: Optional[str] = ""
 
 class ContactForm(BaseModel):
@@ -114,101 +559,488 @@ class ChatMessage(BaseModel):
     message: str
     session_id: str
 
-# ==================== GOLD PRICE ENGINE ====================
+# Response models: documented in OpenAPI, but hot GET handlers return
+# ORJSONResponse directly so FastAPI skips re-validating trusted data
+
+class ImageDerivatives(BaseModel):
+    original: str
+    src: str
+    srcset: Dict[str, str]  # format -> "url 160w, url 480w, ..."
+    sizes: Dict[str, Dict[str, str]]  # thumbnail/card/detail -> format -> url
+
+class GoldsmithProfileRecord(GoldsmithProfile):
+    gallery_variants: List[ImageDerivatives] = []
+
+class JewelleryRecord(JewelleryItem):
+    image_variants: List[ImageDerivatives] = []
+    created_at: Optional[str] = None
+
+class JewelleryList(BaseModel):
+    items: List[JewelleryRecord]
+    count: int
+
+class EducationArticle(BaseModel):
+    id: str
+    title: str
+    content: str
+    icon: str
+
+class EducationContent(BaseModel):
+    articles: List[EducationArticle]
+
+# ==================== UPSTREAM SIMULATORS ====================
+
+UPSTREAMS = ("goldapi", "llm", "telegram", "resend")
+UPSTREAM_MODES = ("live", "simulate", "record", "replay")
+
+# Latency in ms: fixed (value_ms), uniform (min_ms, max_ms) or lognormal (median_ms, sigma)
+DEFAULT_UPSTREAM_PROFILES = {
+    "goldapi": {"latency": {"distribution": "lognormal", "median_ms": 150, "sigma": 0.4},
+                "error_rate": 0.0, "timeout_rate": 0.0, "timeout_after_ms": 10000},
+    "llm": {"latency": {"distribution": "lognormal", "median_ms": 1200, "sigma": 0.5},
+            "error_rate": 0.0, "timeout_rate": 0.0, "timeout_after_ms": 60000},
+    "telegram": {"latency": {"distribution": "lognormal", "median_ms": 200, "sigma": 0.3},
+                 "error_rate": 0.0, "timeout_rate": 0.0, "timeout_after_ms": 5000},
+    "resend": {"latency": {"distribution": "lognormal", "median_ms": 300, "sigma": 0.3},
+               "error_rate": 0.0, "timeout_rate": 0.0, "timeout_after_ms": 10000}
+}
+
+class SimulatedUpstreamError(Exception):
+    """Injected upstream failure"""
+
+def upstream_mode(name: str) -> str:
+    mode = os.environ.get(f"UPSTREAM_MODE_{name.upper()}", UPSTREAM_MODE)
+    if mode not in UPSTREAM_MODES:
+        raise ValueError(f"Unknown upstream mode for {name}: {mode}")
+    return mode
+
+def upstream_is_simulated(name: str) -> bool:
+    return upstream_mode(name) in ("simulate", "replay")
+
+def load_upstream_profiles() -> dict:
+    """Defaults merged with the optional JSON override file"""
+    profiles = {name: {**profile, "latency": {**profile["latency"]}} for name, profile in DEFAULT_UPSTREAM_PROFILES.items()}
+    if UPSTREAM_SIMULATION_CONFIG:
+        with open(UPSTREAM_SIMULATION_CONFIG) as f:
+            overrides = json.load(f)
+        for name, override in overrides.items():
+            if name not in UPSTREAMS:
+                raise ValueError(
+                    f"Unknown upstream {name!r} in {UPSTREAM_SIMULATION_CONFIG}; expected one of {', '.join(UPSTREAMS)}"
+                )
+            latency = override.pop("latency", None)
+            profiles[name].update(override)
+            if latency:
+                profiles[name]["latency"] = latency
+    return profiles
+
+def fixture_key(request: dict) -> str:
+    return json.dumps(request, sort_keys=True, default=str)
+
+def record_fixture(name: str, request: dict, response):
+    """Append a live exchange to fixtures/<upstream>.jsonl"""
+    os.makedirs(UPSTREAM_FIXTURES_DIR, exist_ok=True)
+    with open(os.path.join(UPSTREAM_FIXTURES_DIR, f"{name}.jsonl"), "a") as f:
+        f.write(json.dumps({"request": request, "response": response}, default=str) + "\n")
 
-async def fetch_gold_price_from_api():
-    """Fetch gold price from free API"""
+# Typical per-gram INR rates and INR per unit of currency, for synthetic quotes
+SIMULATED_INR_PER_GRAM = {"XAU": 7500.0, "XAG": 95.0}
+SIMULATED_INR_PER_UNIT = {"INR": 1.0, "USD": 83.0, "AED": 22.6, "EUR": 90.0, "GBP": 105.0}
+
+def synthesize_goldapi(request: dict, simulator) -> dict:
+    # Seeded random walk per metal/currency around typical rates
+    metal, currency = request.get("metal", "XAU"), request.get("currency", "INR")
+    key = f"{metal}/{currency}"
+    start = SIMULATED_INR_PER_GRAM.get(metal, 7500.0) / SIMULATED_INR_PER_UNIT.get(currency, 1.0)
+    simulator.state[key] = simulator.state.get(key, start) * (1 + simulator.rng.gauss(0, 0.002))
+    return {"price_gram_24k": round(simulator.state[key], 4), "metal": metal, "currency": currency}
+
+def synthesize_llm(request: dict, simulator) -> str:
+    return (f"(simulated assistant) Thank you for asking about \"{request.get('text', '')[:80]}\". "
+            "Please contact us for a personalised estimate.")
+
+def synthesize_telegram(request: dict, simulator) -> dict:
+    simulator.state["message_id"] = simulator.state.get("message_id", 0) + 1
+    return {"ok": True, "result": {"message_id": simulator.state["message_id"]}}
+
+def synthesize_resend(request: dict, simulator) -> dict:
+    simulator.state["sent"] = simulator.state.get("sent", 0) + 1
+    return {"id": f"sim-{simulator.state['sent']:06d}"}
+
+UPSTREAM_SYNTHESIZERS = {
+    "goldapi": synthesize_goldapi,
+    "llm": synthesize_llm,
+    "telegram": synthesize_telegram,
+    "resend": synthesize_resend
+}
+
+class UpstreamSimulator:
+    """Seeded local stand-in for one upstream: latency, errors, timeouts, fixtures"""
+
+    def __init__(self, name: str, profile: dict, replay: bool):
+        self.name = name
+        self.profile = profile
+        self.rng = random.Random(f"{UPSTREAM_SIMULATION_SEED}:{name}")
+        self.state = {}
+        self.fixtures = {}
+        self.fixture_order = []
+        if replay:
+            self.load_fixtures()
+
+    def load_fixtures(self):
+        path = os.path.join(UPSTREAM_FIXTURES_DIR, f"{self.name}.jsonl")
+        with open(path) as f:
+            for line in f:
+                if line.strip():
+                    exchange = json.loads(line)
+                    self.fixtures.setdefault(fixture_key(exchange["request"]), []).append(exchange["response"])
+                    self.fixture_order.append(exchange["response"])
+        if not self.fixture_order:
+            raise ValueError(f"No fixtures recorded in {path}")
+
+    def latency_seconds(self) -> float:
+        latency = self.profile["latency"]
+        distribution = latency.get("distribution", "fixed")
+        if distribution == "uniform":
+            value_ms = self.rng.uniform(latency["min_ms"], latency["max_ms"])
+        elif distribution == "lognormal":
+            value_ms = self.rng.lognormvariate(np.log(latency["median_ms"]), latency["sigma"])
+        else:
+            value_ms = latency.get("value_ms", 0)
+        return value_ms / 1000
+
+    def replay_response(self, request: dict):
+        """Exact request match first, then recorded order (cycling)"""
+        matches = self.fixtures.get(fixture_key(request))
+        if matches:
+            self.state["replayed"] = self.state.get("replayed", 0) + 1
+            return matches[(self.state["replayed"] - 1) % len(matches)]
+        self.state["sequence"] = self.state.get("sequence", 0) + 1
+        return self.fixture_order[(self.state["sequence"] - 1) % len(self.fixture_order)]
+
+    async def call(self, request: dict):
+        # Draw latency and outcome before awaiting so runs stay reproducible
+        latency = self.latency_seconds()
+        roll = self.rng.random()
+        if roll < self.profile["timeout_rate"]:
+            await asyncio.sleep(self.profile["timeout_after_ms"] / 1000)
+            raise httpx.ReadTimeout(f"Simulated {self.name} timeout")
+        await asyncio.sleep(latency)
+        if roll < self.profile["timeout_rate"] + self.profile["error_rate"]:
+            raise SimulatedUpstreamError(f"Simulated {self.name} error")
+        if self.fixture_order:
+            return self.replay_response(request)
+        return UPSTREAM_SYNTHESIZERS[self.name](request, self)
+
+upstream_simulators = {}
+
+def get_upstream_simulator(name: str) -> UpstreamSimulator:
+    if name not in upstream_simulators:
+        upstream_simulators[name] = UpstreamSimulator(
+            name, load_upstream_profiles()[name], replay=upstream_mode(name) == "replay"
+        )
+    return upstream_simulators[name]
+
+async def call_upstream(name: str, request: dict, live_call):
+    """Route one upstream call to the live service, a simulator or recorded fixtures"""
+    profile = current_profile.get()
+    if profile is None:
+        return await route_upstream(name, request, live_call)
+    start = time.perf_counter()
     try:
-        async with httpx.AsyncClient() as client:
-            # Using Gold API (free tier)
-            response = await client.get(
-                "https://www.goldapi.io/api/XAU/INR",
-                headers={"x-access-token": "goldapi-demo"},
-                timeout=10
-            )
-            if response.status_code == 200:
-                data = response.json()
-                gold_per_gram = data.get("price_gram_24k", 0)
-                return gold_per_gram
-    except Exception as e:
-        print(f"Gold API fetch error: {e}")
-    return None
+        response = await route_upstream(name, request, live_call)
+    except BaseException:
+        profile.add_span("upstream", name, start, False)
+        raise
+    profile.add_span("upstream", name, start, True)
+    return response
 
-@app.get("/api/gold-price")
-async def get_gold_price():
-    """Get current gold and silver prices"""
-    # Try to fetch from API
-    api_price = await fetch_gold_price_from_api()
-    
-    # Get stored price from DB
-    stored_price = await app.mongodb.gold_prices.find_one(
-        {}, {"_id": 0}, sort=[("timestamp", -1)]
+async def route_upstream(name: str, request: dict, live_call):
+    mode = upstream_mode(name)
+    if mode == "live":
+        return await live_call()
+    if mode == "record":
+        response = await live_call()
+        record_fixture(name, request, response)
+        return response
+    return await get_upstream_simulator(name).call(request)
+
+class SimulatedLlmChat:
+    """Stands in for LlmChat when the llm upstream is simulated"""
+
+    def __init__(self):
+        self.messages = []
+
+    def add_user_message(self, content: str):
+        self.messages.append(("user", content))
+
+    def add_assistant_message(self, content: str):
+        self.messages.append(("assistant", content))
+
+# ==================== GOLD PRICE ENGINE ====================
+
+async def fetch_goldapi_live(client: httpx.AsyncClient, metal: str, currency: str) -> dict:
+    # Using Gold API (free tier)
+    response = await client.get(
+        f"https://www.goldapi.io/api/{metal}/{currency}",
+        headers={"x-access-token": "goldapi-demo"}
     )
+    response.raise_for_status()
+    return response.json()
+
+async def fetch_prices_from_api() -> dict:
+    """Fetch XAU and XAG per-gram rates in every configured currency concurrently.
     
-    if api_price and api_price > 0:
-        # Calculate other purities
-        gold_24k = api_price
-        gold_22k = gold_24k * (22/24)
-        gold_18k = gold_24k * (18/24)
-        silver = gold_24k / 80  # Approximate silver ratio
+    All requests share one deadline; whatever completed in time is returned as
+    {(metal, currency): price_per_gram}.
+    """
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + PRICE_FETCH_DEADLINE_SECONDS
+    
+    # The default 5 s client timeout would otherwise cap each request below the deadline
+    async with httpx.AsyncClient(timeout=PRICE_FETCH_DEADLINE_SECONDS) as client:
+        async def fetch_quote(metal: str, currency: str) -> float:
+            data = await asyncio.wait_for(
+                call_upstream(
+                    "goldapi", {"metal": metal, "currency": currency},
+                    lambda: fetch_goldapi_live(client, metal, currency)
+                ),
+                timeout=max(deadline - loop.time(), 0)
+            )
+            return data.get("price_gram_24k", 0)
         
-        price_data = {
-            "gold_24k": round(gold_24k, 2),
-            "gold_22k": round(gold_22k, 2),
-            "gold_18k": round(gold_18k, 2),
-            "silver": round(silver, 2),
-            "timestamp": datetime.now(timezone.utc).isoformat(),
-            "source": "live"
-        }
-        # Store in DB
-        await app.mongodb.gold_prices.insert_one({**price_data})
-        return price_data
+        pairs = [(metal, currency) for currency in PRICE_CURRENCIES for metal in ("XAU", "XAG")]
+        results = await asyncio.gather(*(fetch_quote(*pair) for pair in pairs), return_exceptions=True)
     
-    if stored_price:
-        return stored_price
+    quotes = {}
+    for pair, result in zip(pairs, results):
+        if isinstance(result, BaseException):
+            print(f"Gold API fetch error {pair[0]}/{pair[1]}: {result!r}")
+        elif result and result > 0:
+            quotes[pair] = result
+    return quotes
+
+# In-process copy of the shared snapshot; requests never call goldapi directly
+price_snapshot = {"version": 0, "price": None}
+PRICE_KEYS = ("gold_24k", "gold_22k", "gold_18k", "silver")
+
+def purity_rates(gold_24k: float, silver: float) -> dict:
+    """Derive all purities from the 24K per-gram rate"""
+    return {
+        "gold_24k": round(gold_24k, 2),
+        "gold_22k": round(gold_24k * (22/24), 2),
+        "gold_18k": round(gold_24k * (18/24), 2),
+        "silver": round(silver, 4)
+    }
+
+def build_price_data(quotes: dict, previous: Optional[dict]) -> Optional[dict]:
+    """One snapshot for all currencies; base-currency rates stay at the top level.
     
-    # Default fallback prices (Indian market approximation)
+    A currency needs a live gold quote. A missing silver quote keeps that
+    currency's previous silver rate, or the currency is skipped.
+    """
+    previous_currencies = (previous or {}).get("currencies", {})
+    currencies = {}
+    for currency in PRICE_CURRENCIES:
+        gold = quotes.get(("XAU", currency))
+        silver = quotes.get(("XAG", currency)) or previous_currencies.get(currency, {}).get("silver")
+        if gold and silver:
+            currencies[currency] = purity_rates(gold, silver)
+    if BASE_CURRENCY not in currencies:
+        return None
     return {
-        "gold_24k": 7500.00,
-        "gold_22k": 6875.00,
-        "gold_18k": 5625.00,
-        "silver": 95.00,
+        **currencies[BASE_CURRENCY],
+        "currencies": currencies,
         "timestamp": datetime.now(timezone.utc).isoformat(),
-        "source": "default"
+        "source": "live"
     }
 
+def rescale_currencies(price_data: dict, previous: Optional[dict]) -> dict:
+    """Currencies for a manual INR price: each previous rate moved by the same ratio as INR"""
+    currencies = {BASE_CURRENCY: {key: price_data[key] for key in PRICE_KEYS}}
+    previous_currencies = (previous or {}).get("currencies", {})
+    base = previous_currencies.get(BASE_CURRENCY)
+    if not base or not all(base[key] for key in PRICE_KEYS):
+        return currencies
+    for currency, rates in previous_currencies.items():
+        if currency != BASE_CURRENCY:
+            currencies[currency] = {
+                key: round(rates[key] * price_data[key] / base[key], 4 if key == "silver" else 2)
+                for key in PRICE_KEYS
+            }
+    return currencies
+
+def price_quote(snapshot: dict, currency: str) -> Optional[dict]:
+    """Flat per-currency view of a snapshot, as served by /api/gold-price"""
+    rates = snapshot.get("currencies", {}).get(currency)
+    if rates is None and currency == BASE_CURRENCY:
+        rates = {key: snapshot[key] for key in PRICE_KEYS}
+    if rates is None:
+        return None
+    return {**rates, "currency": currency, "timestamp": snapshot["timestamp"], "source": snapshot["source"]}
+
+def set_local_price_snapshot(version: int, price_data: dict):
+    """Swap in a new snapshot for this worker"""
+    price_snapshot["version"] = version
+    price_snapshot["price"] = price_data
+    catalogue_table.reprice(price_data)
+
+async def acquire_price_lease() -> bool:
+    """Take or renew the refresher lease; True if this worker holds it"""
+    now = datetime.now(timezone.utc)
+    try:
+        lease = await app.mongodb.leases.find_one_and_update(
+            {"_id": PRICE_LEASE_ID, "$or": [{"holder": app.worker_id}, {"expires_at": {"$lt": now}}]},
+            {"$set": {"holder": app.worker_id, "expires_at": now + timedelta(seconds=PRICE_LEASE_SECONDS)}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+    except DuplicateKeyError:
+        # Another worker holds an unexpired lease
+        return False
+    return lease is not None and lease.get("holder") == app.worker_id
+
+async def release_price_lease():
+    """Give up the lease so another worker can take over immediately"""
+    try:
+        await app.mongodb.leases.delete_one({"_id": PRICE_LEASE_ID, "holder": app.worker_id})
+    except Exception as e:
+        print(f"Price lease release error: {e}")
+
+async def publish_price_snapshot(price_data: dict):
+    """Record a price and bump the shared snapshot version for all workers"""
+    await write_buffer.insert("gold_prices", {**price_data})
+    state = await app.mongodb.price_state.find_one_and_update(
+        {"_id": "current"},
+        {"$inc": {"version": 1}, "$set": {"price": price_data}},
+        upsert=True,
+        return_document=ReturnDocument.AFTER
+    )
+    set_local_price_snapshot(state["version"], state["price"])
+
+async def sync_price_snapshot():
+    """Cheap version poll; loads the full snapshot only when it changed"""
+    state = await app.mongodb.price_state.find_one({"_id": "current"}, {"version": 1})
+    if not state or state["version"] == price_snapshot["version"]:
+        return
+    state = await app.mongodb.price_state.find_one({"_id": "current"})
+    if state and state.get("price"):
+        set_local_price_snapshot(state["version"], state["price"])
+
+async def refresh_price_snapshot():
+    """Fetch upstream and publish (lease holder only)"""
+    quotes = await fetch_prices_from_api()
+    price_data = build_price_data(quotes, price_snapshot["price"])
+    if price_data:
+        await publish_price_snapshot(price_data)
+
+async def price_refresh_loop():
+    """Elect one refresher via the Mongo lease; every worker polls the version"""
+    next_refresh = 0.0
+    is_leader = False
+    alerts_version = 0
+    while True:
+        try:
+            if time.monotonic() >= next_refresh:
+                next_refresh = time.monotonic() + PRICE_REFRESH_SECONDS
+                is_leader = await acquire_price_lease()
+                if is_leader:
+                    await refresh_price_snapshot()
+            await sync_price_snapshot()
+            # Alerts are matched once per tick, by the lease holder only
+            if is_leader and price_snapshot["price"] and price_snapshot["version"] != alerts_version:
+                version = price_snapshot["version"]
+                await evaluate_price_alerts(price_snapshot["price"])
+                # Only after success, so a failed tick is evaluated again on the next poll
+                alerts_version = version
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"Price refresh error: {e}")
+        await asyncio.sleep(PRICE_POLL_SECONDS)
+
+@app.get("/api/gold-price", response_model=GoldPriceQuote)
+async def get_gold_price_endpoint(
+    currency: str = Query(default=BASE_CURRENCY, description="Currency code, e.g. INR, USD, AED")
+):
+    """Get current gold and silver prices"""
+    return ORJSONResponse(await get_gold_price(currency))
+
+async def get_gold_price(currency: str = BASE_CURRENCY):
+    """Current prices in one currency as a dict, for handlers that compute on top of them"""
+    snapshot = price_snapshot["price"]
+    if not snapshot:
+        # Cold start before the first snapshot: fall back to last stored price
+        snapshot = await app.mongodb.gold_prices.find_one(
+            {}, {"_id": 0}, sort=[("timestamp", -1)]
+        )
+    if not snapshot:
+        # Default fallback prices (Indian market approximation)
+        snapshot = {
+            "gold_24k": 7500.00,
+            "gold_22k": 6875.00,
+            "gold_18k": 5625.00,
+            "silver": 95.00,
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "source": "default"
+        }
+    
+    currency = currency.upper()
+    if currency not in PRICE_CURRENCIES:
+        raise HTTPException(status_code=400, detail=f"Currency must be one of: {', '.join(PRICE_CURRENCIES)}")
+    quote = price_quote(snapshot, currency)
+    if quote is None:
+        raise HTTPException(status_code=503, detail=f"Prices in {currency} are not available right now")
+    return quote
+
 @app.post("/api/gold-price")
 async def update_gold_price(price: GoldPrice):
     """Manually update gold prices (admin)"""
     price_data = price.model_dump()
+    price_data["currencies"] = rescale_currencies(price_data, price_snapshot["price"])
     price_data["timestamp"] = datetime.now(timezone.utc).isoformat()
-    await app.mongodb.gold_prices.insert_one({**price_data})
+    await publish_price_snapshot(price_data)
     return {"status": "success", "message": "Gold price updated"}
 
 # ==================== PRICE CALCULATOR ====================
 
+GST_RATE = 0.03
+
+def purity_rate(prices: dict, purity: str) -> float:
+    """Per-gram gold rate for a purity, defaulting to 22K"""
+    purity_map = {
+        "24K": prices["gold_24k"],
+        "22K": prices["gold_22k"],
+        "18K": prices["gold_18k"]
+    }
+    return purity_map.get(purity, prices["gold_22k"])
+
+def estimate_price(gold_rate: float, weight: float, labour_per_gram: float, include_gst: bool = True) -> float:
+    """(Gold + labour) x weight, plus GST"""
+    subtotal = (gold_rate + labour_per_gram) * weight
+    return subtotal * (1 + GST_RATE) if include_gst else subtotal
+
 @app.post("/api/calculate-price")
 async def calculate_price(
     weight: float = Query(..., description="Weight in grams"),
     purity: str = Query(..., description="Gold purity: 24K, 22K, 18K"),
     labour_per_gram: float = Query(default=500, description="Labour cost per gram"),
-    include_gst: bool = Query(default=True, description="Include 3% GST")
+    include_gst: bool = Query(default=True, description="Include 3% GST"),
+    currency: str = Query(default=BASE_CURRENCY, description="Currency for the result; labour is given in INR")
 ):
     """Calculate jewellery price with breakdown"""
-    prices = await get_gold_price()
-    
-    purity_map = {
-        "24K": prices["gold_24k"],
-        "22K": prices["gold_22k"],
-        "18K": prices["gold_18k"]
-    }
+    prices = await get_gold_price(currency)
     
-    gold_rate = purity_map.get(purity, prices["gold_22k"])
+    gold_rate = purity_rate(prices, purity)
+    if prices["currency"] != BASE_CURRENCY:
+        # Convert INR labour at the exchange rate implied by the two gold quotes
+        base_prices = await get_gold_price()
+        labour_per_gram = labour_per_gram * prices["gold_24k"] / base_prices["gold_24k"]
     
     gold_value = gold_rate * weight
     labour_cost = labour_per_gram * weight
     subtotal = gold_value + labour_cost
-    gst = subtotal * 0.03 if include_gst else 0
+    gst = subtotal * GST_RATE if include_gst else 0
     total = subtotal + gst
     
     return {
@@ -216,8 +1048,9 @@ async def calculate_price(
             "gold_rate_per_gram": round(gold_rate, 2),
             "weight": weight,
             "purity": purity,
+            "currency": prices["currency"],
             "gold_value": round(gold_value, 2),
-            "labour_per_gram": labour_per_gram,
+            "labour_per_gram": round(labour_per_gram, 2),
             "labour_cost": round(labour_cost, 2),
             "subtotal": round(subtotal, 2),
             "gst_rate": "3%" if include_gst else "0%",
@@ -230,26 +1063,540 @@ async def calculate_price(
         }
     }
 
+# ==================== PRICE ALERTS ====================
+
+PRICE_FIELDS = {"24K": "gold_24k", "22K": "gold_22k", "18K": "gold_18k", "silver": "silver"}
+ALERT_DIRECTIONS = ("below", "above")
+ALERT_DELIVERY_CONCURRENCY = 20
+
+class AlertIndex:
+    """Sorted thresholds per (purity, direction); each tick is two bisects per key"""
+
+    def __init__(self):
+        self.thresholds = {}  # (purity, direction) -> ascending thresholds
+        self.alert_ids = {}  # (purity, direction) -> alert ids, parallel to thresholds
+        self.known = set()
+        self.loaded_at = None
+
+    def add(self, alert: dict):
+        if alert["alert_id"] in self.known:
+            return
+        key = (alert["purity"], alert["direction"])
+        thresholds = self.thresholds.setdefault(key, [])
+        alert_ids = self.alert_ids.setdefault(key, [])
+        position = bisect.bisect_right(thresholds, alert["threshold"])
+        thresholds.insert(position, alert["threshold"])
+        alert_ids.insert(position, alert["alert_id"])
+        self.known.add(alert["alert_id"])
+
+    def pop_matches(self, prices: dict) -> List[str]:
+        """Remove and return every alert the prices cross; matches are one contiguous slice per key"""
+        matched = []
+        for (purity, direction), thresholds in self.thresholds.items():
+            price = prices.get(PRICE_FIELDS[purity])
+            if price is None:
+                continue
+            if direction == "below":
+                # price <= threshold
+                hit = slice(bisect.bisect_left(thresholds, price), len(thresholds))
+            else:
+                # price >= threshold
+                hit = slice(0, bisect.bisect_right(thresholds, price))
+            alert_ids = self.alert_ids[(purity, direction)]
+            matched.extend(alert_ids[hit])
+            del thresholds[hit]
+            del alert_ids[hit]
+        self.known.difference_update(matched)
+        return matched
+
+# Only populated on the lease holder, which is the only worker evaluating alerts
+alert_index = AlertIndex()
+
+async def sync_alert_index():
+    """Load active subscriptions created since the last sync"""
+    query = {"status": "active"}
+    if alert_index.loaded_at:
+        # Overlap the watermark to absorb clock skew between workers
+        query["created_at"] = {"$gte": (alert_index.loaded_at - timedelta(seconds=60)).isoformat()}
+    started = datetime.now(timezone.utc)
+    async for alert in app.mongodb.price_alerts.find(
+        query, {"_id": 0, "alert_id": 1, "purity": 1, "direction": 1, "threshold": 1}
+    ):
+        alert_index.add(alert)
+    alert_index.loaded_at = started
+
+async def deliver_price_alert(alert: dict, prices: dict, semaphore: asyncio.Semaphore):
+    """Notify one subscriber via Resend and/or Telegram"""
+    price = prices[PRICE_FIELDS[alert["purity"]]]
+    label = "Silver" if alert["purity"] == "silver" else f"{alert['purity']} Gold"
+    text = f"{label} is now ₹{price:,.2f}/g ({alert['direction']} your target of ₹{alert['threshold']:,.2f}/g)"
+    async with semaphore:
+        if alert.get("email"):
+            await send_email_notification(
+                alert["email"],
+                f"Price alert: {label} ₹{price:,.2f}/g",
+                f"<div style=\"font-family: Arial, sans-serif;\"><h2 style=\"color: #064E3B;\">Gold Price Alert</h2><p>{text}</p></div>"
+            )
+        if alert.get("telegram_chat_id"):
+            await send_telegram_notification(f"🔔 <b>Price Alert</b>\n\n{text}", chat_id=alert["telegram_chat_id"])
+
+async def evaluate_price_alerts(prices: dict):
+    """Match subscriptions against a price tick, mark them triggered and deliver once"""
+    await sync_alert_index()
+    matched = alert_index.pop_matches(prices)
+    if not matched:
+        return
+    try:
+        # Skip alerts cancelled since they were indexed
+        alerts = await app.mongodb.price_alerts.find(
+            {"alert_id": {"$in": matched}, "status": "active"}, {"_id": 0}
+        ).to_list(len(matched))
+        if not alerts:
+            return
+        await app.mongodb.price_alerts.update_many(
+            {"alert_id": {"$in": [alert["alert_id"] for alert in alerts]}, "status": "active"},
+            {"$set": {"status": "triggered", "triggered_at": datetime.now(timezone.utc).isoformat()}}
+        )
+    except Exception:
+        # Matches are still active in Mongo: force a full reload so they are evaluated again
+        alert_index.loaded_at = None
+        raise
+    semaphore = asyncio.Semaphore(ALERT_DELIVERY_CONCURRENCY)
+    await asyncio.gather(*(deliver_price_alert(alert, prices, semaphore) for alert in alerts))
+
+@app.post("/api/price-alerts")
+async def create_price_alert(subscription: PriceAlertSubscription):
+    """Subscribe to a one-time alert when a purity crosses a threshold"""
+    if subscription.purity not in PRICE_FIELDS:
+        raise HTTPException(status_code=400, detail=f"Purity must be one of: {', '.join(PRICE_FIELDS)}")
+    if subscription.direction not in ALERT_DIRECTIONS:
+        raise HTTPException(status_code=400, detail="Direction must be 'below' or 'above'")
+    if not subscription.email and not subscription.telegram_chat_id:
+        raise HTTPException(status_code=400, detail="Provide an email or a Telegram chat id")
+    # Triggered alerts are never retried, so refuse channels that cannot deliver
+    if subscription.email and not (upstream_is_simulated("resend") or os.environ.get("RESEND_API_KEY")):
+        raise HTTPException(status_code=503, detail="Email alerts are not available right now")
+    if subscription.telegram_chat_id and not (upstream_is_simulated("telegram") or TELEGRAM_BOT_TOKEN):
+        raise HTTPException(status_code=503, detail="Telegram alerts are not available right now")
+    
+    alert_data = subscription.model_dump()
+    alert_data["alert_id"] = str(uuid.uuid4())[:8].upper()
+    alert_data["status"] = "active"
+    alert_data["created_at"] = datetime.now(timezone.utc).isoformat()
+    await app.mongodb.price_alerts.insert_one({**alert_data})
+    return {"status": "success", "alert_id": alert_data["alert_id"]}
+
+@app.delete("/api/price-alerts/{alert_id}")
+async def cancel_price_alert(alert_id: str):
+    """Cancel an active price alert"""
+    result = await app.mongodb.price_alerts.update_one(
+        {"alert_id": alert_id, "status": "active"}, {"$set": {"status": "cancelled"}}
+    )
+    if result.matched_count == 0:
+        raise HTTPException(status_code=404, detail="Alert not found")
+    return {"status": "success", "message": "Alert cancelled"}
+
 # ==================== GOLDSMITH PROFILE ====================
 
-@app.get("/api/goldsmith")
+@app.get("/api/goldsmith", response_model=GoldsmithProfileRecord)
 async def get_goldsmith_profile():
     """Get goldsmith profile"""
     profile = await app.mongodb.goldsmith.find_one({}, {"_id": 0})
     if not profile:
         raise HTTPException(status_code=404, detail="Profile not found")
-    return profile
+    return ORJSONResponse(profile)
 
 @app.post("/api/goldsmith")
 async def update_goldsmith_profile(profile: GoldsmithProfile):
     """Update goldsmith profile"""
     profile_data = profile.model_dump()
+    profile_data["gallery_variants"] = build_image_variants(profile_data["gallery_images"])
     await app.mongodb.goldsmith.replace_one({}, profile_data, upsert=True)
     return {"status": "success", "message": "Profile updated"}
 
+# ==================== CATALOGUE INDEXES ====================
+
+# Bumped in Mongo on every catalogue write; workers reload their indexes on change
+catalogue_state = {"version": 0}
+
+CATALOGUE_CATEGORIES = ("type", "occasion", "gender", "purity")
+CATALOGUE_FIELDS = tuple(JewelleryRecord.model_fields)
+CATALOGUE_FIELD_SET = frozenset(CATALOGUE_FIELDS)
+CATALOGUE_PAGE_SIZE = 100
+
+class CatalogueRow:
+    """One catalogue document as a compact record; returned exactly as stored"""
+    __slots__ = CATALOGUE_FIELDS + ("extra",)
+
+    def __init__(self, item: dict):
+        extra = {}
+        for field, value in item.items():
+            if field in CATALOGUE_FIELD_SET:
+                setattr(self, field, value)
+            else:
+                extra[field] = value
+        # Fields the document lacks stay unset, like a missing key in Mongo
+        self.extra = extra or None
+
+    def to_document(self) -> dict:
+        document = {}
+        for field in CATALOGUE_FIELDS:
+            try:
+                document[field] = getattr(self, field)
+            except AttributeError:
+                pass
+        if self.extra:
+            document.update(self.extra)
+        return document
+
+def catalogue_number(value) -> float:
+    """Numeric column value; NaN (never matches a comparison) when missing or not a number"""
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return float(value)
+    return np.nan
+
+def catalogue_flag(value) -> int:
+    """Tri-state is_featured: 1 true, 0 false, -1 missing (matches neither, as in Mongo)"""
+    if value is True:
+        return 1
+    if value is False:
+        return 0
+    return -1
+
+class CatalogueTable:
+    """Columnar copy of the catalogue; listings are NumPy masks over these columns.
+    
+    type/occasion/gender/purity are stored as integer codes, weights and labour
+    as float arrays, and rows stay in insertion order like a Mongo scan.
+    Missing fields never match a filter on them, like the equivalent Mongo query.
+    Budget filters read cost columns that are only rebuilt on price ticks.
+    """
+
+    def __init__(self):
+        self.set_items([], None)
+
+    def set_items(self, items: List[dict], prices: Optional[dict]):
+        self.rows = [CatalogueRow(item) for item in items]
+        self.categories = {column: {} for column in CATALOGUE_CATEGORIES}  # column -> value -> code
+        self.codes = {
+            column: np.array([self.code(column, item.get(column)) for item in items], dtype=np.int32)
+            for column in CATALOGUE_CATEGORIES
+        }
+        self.featured = np.array([catalogue_flag(item.get("is_featured")) for item in items], dtype=np.int8)
+        self.weight_min = np.array([catalogue_number(item.get("weight_min")) for item in items], dtype=np.float64)
+        self.weight_max = np.array([catalogue_number(item.get("weight_max")) for item in items], dtype=np.float64)
+        self.labour = np.array([catalogue_number(item.get("labour_cost_per_gram")) for item in items], dtype=np.float64)
+        self.prices = None
+        if prices:
+            self.reprice(prices)
+
+    def code(self, column: str, value) -> int:
+        if not isinstance(value, str):
+            # Filters are always strings; anything else shares one never-matching code
+            value = None
+        categories = self.categories[column]
+        return categories.setdefault(value, len(categories))
+
+    def add_item(self, item: dict):
+        self.rows.append(CatalogueRow(item))
+        for column in CATALOGUE_CATEGORIES:
+            self.codes[column] = np.append(self.codes[column], np.int32(self.code(column, item.get(column))))
+        self.featured = np.append(self.featured, np.int8(catalogue_flag(item.get("is_featured"))))
+        self.weight_min = np.append(self.weight_min, catalogue_number(item.get("weight_min")))
+        self.weight_max = np.append(self.weight_max, catalogue_number(item.get("weight_max")))
+        self.labour = np.append(self.labour, catalogue_number(item.get("labour_cost_per_gram")))
+        if self.prices:
+            # Price just the new row
+            per_gram = (purity_rate(self.prices, item.get("purity")) + self.labour[-1]) * (1 + GST_RATE)
+            self.min_costs = np.append(self.min_costs, per_gram * self.weight_min[-1])
+            self.max_costs = np.append(self.max_costs, per_gram * self.weight_max[-1])
+
+    def reprice(self, prices: dict):
+        """Rebuild only the price-dependent columns: each row's total cost range"""
+        rates = np.array(
+            [purity_rate(prices, value) for value in self.categories["purity"]], dtype=np.float64
+        )
+        per_gram = (rates[self.codes["purity"]] + self.labour) * (1 + GST_RATE)
+        self.min_costs = per_gram * self.weight_min
+        self.max_costs = per_gram * self.weight_max
+        self.prices = prices
+
+    def query(
+        self,
+        categories: Optional[Dict[str, str]] = None,
+        featured: Optional[bool] = None,
+        min_weight: Optional[float] = None,
+        max_weight: Optional[float] = None,
+        min_budget: Optional[float] = None,
+        max_budget: Optional[float] = None,
+        prices: Optional[dict] = None,
+        limit: int = CATALOGUE_PAGE_SIZE
+    ) -> List[dict]:
+        """Matching documents; weight and budget filters match on range overlap"""
+        mask = np.ones(len(self.rows), dtype=bool)
+        for column, value in (categories or {}).items():
+            code = self.categories[column].get(value)
+            if code is None:
+                return []
+            mask &= self.codes[column] == code
+        if featured is not None:
+            mask &= self.featured == int(featured)
+        if min_weight:
+            mask &= self.weight_max >= min_weight
+        if max_weight:
+            mask &= self.weight_min <= max_weight
+        if min_budget is not None or max_budget is not None:
+            if not self.prices:
+                # Cold start before the first price snapshot
+                self.reprice(prices)
+            if max_budget is not None:
+                mask &= self.min_costs <= max_budget
+            if min_budget is not None:
+                mask &= self.max_costs >= min_budget
+        return [self.rows[i].to_document() for i in np.flatnonzero(mask)[:limit]]
+
+catalogue_table = CatalogueTable()
+
+# Similar items: hashed attribute/text features, cosine similarity, top-k neighbours
+SIMILAR_DIMENSIONS = 512
+SIMILAR_ITEMS_COUNT = 8
+SIMILAR_FEATURE_WEIGHTS = {
+    "type": 3.0, "occasion": 1.5, "gender": 1.5, "purity": 1.0,
+    "weight": 1.0, "labour": 0.75, "text": 1.5
+}
+SIMILAR_STOPWORDS = {
+    "a", "an", "and", "the", "for", "with", "of", "in", "to", "by", "or", "our", "perfect", "design"
+}
+SIMILAR_BLOCK_ROWS = 1024
+SIMILAR_MERGE_ATTEMPTS = 5
+
+def labour_tier(labour_per_gram: float) -> str:
+    """Bucket per-gram labour into low/medium/high"""
+    if labour_per_gram < 500:
+        return "low"
+    if labour_per_gram < 800:
+        return "medium"
+    return "high"
+
+def similarity_vector(item: dict) -> np.ndarray:
+    """Unit-length hashed feature vector; weights are applied per attribute block"""
+    blocks = {
+        "type": {f"type={item.get('type')}": 1.0},
+        "occasion": {f"occasion={item.get('occasion')}": 1.0},
+        "gender": {f"gender={item.get('gender')}": 1.0},
+        "purity": {f"purity={item.get('purity')}": 1.0},
+        "labour": {
+            f"labour={labour_tier(np.nan_to_num(catalogue_number(item.get('labour_cost_per_gram'))))}": 1.0,
+            f"complexity={item.get('making_complexity')}": 1.0
+        },
+        "weight": {},
+        "text": {}
+    }
+    # Log-scale weight bins; neighbouring bins share some similarity
+    midpoint = np.nan_to_num(
+        (catalogue_number(item.get("weight_min")) + catalogue_number(item.get("weight_max"))) / 2
+    )
+    weight_bin = int(np.log2(max(midpoint, 1)) * 2)
+    blocks["weight"] = {f"weight={weight_bin}": 1.0, f"weight={weight_bin - 1}": 0.5, f"weight={weight_bin + 1}": 0.5}
+    for word in re.findall(r"[a-z]+", f"{item.get('name', '')} {item.get('description', '')}".lower()):
+        if len(word) > 2 and word not in SIMILAR_STOPWORDS:
+            blocks["text"][f"word={word}"] = blocks["text"].get(f"word={word}", 0) + 1.0
+
+    vector = np.zeros(SIMILAR_DIMENSIONS, dtype=np.float32)
+    for block, features in blocks.items():
+        norm = np.sqrt(sum(value * value for value in features.values()))
+        if not norm:
+            continue
+        for feature, value in features.items():
+            vector[zlib.crc32(feature.encode()) % SIMILAR_DIMENSIONS] += SIMILAR_FEATURE_WEIGHTS[block] * value / norm
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+class SimilarityIndex:
+    """Item vectors plus precomputed top-k neighbour lists for O(1) lookups"""
+
+    def __init__(self):
+        self.item_ids = []
+        self.positions = {}
+        self.vectors = np.zeros((0, SIMILAR_DIMENSIONS), dtype=np.float32)
+        self.neighbours = {}  # item_id -> [(score, item_id)], best first
+
+    def vectors_for(self, items: List[dict]) -> np.ndarray:
+        """Vectors for items, hashing only the ones this index has not seen (thread-safe)"""
+        positions, vectors = self.positions, self.vectors
+        rows = [
+            vectors[positions[item["item_id"]]] if item["item_id"] in positions else similarity_vector(item)
+            for item in items
+        ]
+        return np.vstack(rows) if rows else np.zeros((0, SIMILAR_DIMENSIONS), dtype=np.float32)
+
+    def set_items(self, items: List[dict], vectors: np.ndarray, neighbours: dict):
+        self.item_ids = [item["item_id"] for item in items]
+        self.positions = {item_id: i for i, item_id in enumerate(self.item_ids)}
+        self.vectors = vectors
+        self.neighbours = neighbours
+
+    def rebuild(self) -> dict:
+        """Full recompute, in row blocks to bound memory; run it off the event loop"""
+        item_ids, vectors = self.item_ids, self.vectors
+        k = min(SIMILAR_ITEMS_COUNT, len(item_ids) - 1)
+        if k <= 0:
+            self.neighbours = {item_id: [] for item_id in item_ids}
+            return self.neighbours
+        neighbours = {}
+        for start in range(0, len(item_ids), SIMILAR_BLOCK_ROWS):
+            scores = vectors[start:start + SIMILAR_BLOCK_ROWS] @ vectors.T
+            rows = np.arange(scores.shape[0])
+            scores[rows, rows + start] = -np.inf  # never your own neighbour
+            top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+            top_scores = np.take_along_axis(scores, top, axis=1)
+            order = np.argsort(-top_scores, axis=1)
+            for row, item_id in enumerate(item_ids[start:start + SIMILAR_BLOCK_ROWS]):
+                neighbours[item_id] = [
+                    (float(top_scores[row, j]), item_ids[top[row, j]]) for j in order[row]
+                ]
+        self.neighbours = neighbours
+        return neighbours
+
+    def add_item(self, item: dict) -> dict:
+        """Score one new item against all others; returns the neighbour lists that changed"""
+        vector = similarity_vector(item)
+        scores = self.vectors @ vector
+        changed = {}
+        for position, score in enumerate(scores.tolist()):
+            other = self.item_ids[position]
+            neighbours = self.neighbours.setdefault(other, [])
+            if len(neighbours) < SIMILAR_ITEMS_COUNT or score > neighbours[-1][0]:
+                neighbours.append((score, item["item_id"]))
+                neighbours.sort(key=lambda pair: -pair[0])
+                del neighbours[SIMILAR_ITEMS_COUNT:]
+                changed[other] = neighbours
+        top = np.argsort(-scores)[:SIMILAR_ITEMS_COUNT]
+        changed[item["item_id"]] = [(float(scores[i]), self.item_ids[i]) for i in top]
+
+        self.positions[item["item_id"]] = len(self.item_ids)
+        self.item_ids.append(item["item_id"])
+        self.vectors = np.vstack([self.vectors, vector])
+        self.neighbours[item["item_id"]] = changed[item["item_id"]]
+        return changed
+
+similarity_index = SimilarityIndex()
+
+def neighbour_documents(pairs: list) -> List[dict]:
+    return [{"item_id": other, "score": round(score, 4)} for score, other in pairs]
+
+def merge_neighbours(stored: list, pairs: list) -> list:
+    """Union of two neighbour lists, best score per item, top-k"""
+    best = {}
+    for score, other in stored + pairs:
+        if other not in best or score > best[other]:
+            best[other] = score
+    return sorted(((score, other) for other, score in best.items()), key=lambda pair: -pair[0])[:SIMILAR_ITEMS_COUNT]
+
+async def save_similar_items(neighbours: dict):
+    """Persist full recomputed neighbour lists so other workers and restarts skip the recompute"""
+    if not neighbours:
+        return
+    await app.mongodb.similar_items.bulk_write([
+        UpdateOne(
+            {"_id": item_id},
+            {"$set": {"neighbours": neighbour_documents(pairs)}, "$inc": {"version": 1}},
+            upsert=True
+        )
+        for item_id, pairs in neighbours.items()
+    ], ordered=False)
+
+async def merge_similar_list(item_id: str, pairs: list, doc: Optional[dict]) -> bool:
+    """Version-checked write of one merged list; False if another worker wrote it first"""
+    stored = [(n["score"], n["item_id"]) for n in doc["neighbours"]] if doc else []
+    merged = merge_neighbours(stored, pairs)
+    if doc is None:
+        try:
+            await app.mongodb.similar_items.insert_one(
+                {"_id": item_id, "neighbours": neighbour_documents(merged), "version": 1}
+            )
+        except DuplicateKeyError:
+            return False
+    else:
+        version = doc.get("version")
+        result = await app.mongodb.similar_items.update_one(
+            {"_id": item_id, "version": version},
+            {"$set": {"neighbours": neighbour_documents(merged), "version": (version or 0) + 1}}
+        )
+        if result.matched_count == 0:
+            return False
+    similarity_index.neighbours[item_id] = merged
+    return True
+
+async def merge_similar_items(changed: dict):
+    """Merge one worker's neighbour changes into the stored lists; a per-list version check
+    stops two workers adding items at once from overwriting each other's entries"""
+    pending = dict(changed)
+    for _ in range(SIMILAR_MERGE_ATTEMPTS):
+        if not pending:
+            return
+        stored = {
+            doc["_id"]: doc
+            async for doc in app.mongodb.similar_items.find({"_id": {"$in": list(pending)}})
+        }
+        written = await asyncio.gather(*(
+            merge_similar_list(item_id, pairs, stored.get(item_id)) for item_id, pairs in pending.items()
+        ))
+        pending = {item_id: pairs for (item_id, pairs), ok in zip(pending.items(), written) if not ok}
+    if pending:
+        # Fixed by the next `python server.py rebuild-similar`
+        print(f"Similar items merge error: {len(pending)} lists still conflicting")
+
+async def rebuild_similar_items() -> int:
+    """Offline full recompute of every neighbour list; returns items processed"""
+    items = await app.mongodb.jewellery.find({}, {"_id": 0}).to_list(None)
+    similarity_index.set_items(items, await asyncio.to_thread(similarity_index.vectors_for, items), {})
+    await save_similar_items(await asyncio.to_thread(similarity_index.rebuild))
+    return len(items)
+
+async def reload_catalogue_indexes():
+    """Rebuild every in-memory catalogue index from Mongo"""
+    state = await app.mongodb.catalogue_state.find_one({"_id": "current"})
+    items = await app.mongodb.jewellery.find({}, {"_id": 0}).to_list(None)
+    catalogue_table.set_items(items, price_snapshot["price"])
+    
+    neighbours = {
+        doc["_id"]: [(n["score"], n["item_id"]) for n in doc["neighbours"]]
+        async for doc in app.mongodb.similar_items.find({})
+    }
+    # Only items this worker has not indexed yet are hashed, off the event loop
+    vectors = await asyncio.to_thread(similarity_index.vectors_for, items)
+    similarity_index.set_items(items, vectors, neighbours)
+    if any(item["item_id"] not in neighbours for item in items):
+        # First run or lists missing: compute everything once and persist
+        await save_similar_items(await asyncio.to_thread(similarity_index.rebuild))
+    catalogue_state["version"] = state["version"] if state else 0
+
+async def bump_catalogue_version():
+    """Tell other workers the catalogue changed; this worker is already up to date"""
+    state = await app.mongodb.catalogue_state.find_one_and_update(
+        {"_id": "current"}, {"$inc": {"version": 1}},
+        upsert=True, return_document=ReturnDocument.AFTER
+    )
+    if state["version"] == catalogue_state["version"] + 1:
+        catalogue_state["version"] = state["version"]
+
+async def catalogue_sync_loop():
+    """Cheap version poll; reloads the indexes only when another worker wrote"""
+    while True:
+        try:
+            state = await app.mongodb.catalogue_state.find_one({"_id": "current"}, {"version": 1})
+            if state and state["version"] != catalogue_state["version"]:
+                await reload_catalogue_indexes()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"Catalogue sync error: {e}")
+        await asyncio.sleep(CATALOGUE_POLL_SECONDS)
+
 # ==================== JEWELLERY CATALOGUE ====================
 
-@app.get("/api/jewellery")
+@app.get("/api/jewellery", response_model=JewelleryList)
 async def get_jewellery(
     type: Optional[str] = None,
     occasion: Optional[str] = None,
@@ -257,63 +1604,174 @@ async def get_jewellery(
     purity: Optional[str] = None,
     featured: Optional[bool] = None,
     min_weight: Optional[float] = None,
-    max_weight: Optional[float] = None
+    max_weight: Optional[float] = None,
+    min_budget: Optional[float] = Query(None, description="Lowest total price incl. labour and GST"),
+    max_budget: Optional[float] = Query(None, description="Highest total price incl. labour and GST")
 ):
-    """Get jewellery catalogue with filters"""
-    query = {}
-    if type:
-        query["type"] = type
-    if occasion:
-        query["occasion"] = occasion
-    if gender:
-        query["gender"] = gender
-    if purity:
-        query["purity"] = purity
-    if featured is not None:
-        query["is_featured"] = featured
-    if min_weight:
-        query["weight_max"] = {"$gte": min_weight}
-    if max_weight:
-        query["weight_min"] = {"$lte": max_weight}
-    
-    items = await app.mongodb.jewellery.find(query, {"_id": 0}).to_list(100)
-    return {"items": items, "count": len(items)}
-
-@app.get("/api/jewellery/{item_id}")
+    """Get jewellery catalogue with filters, served from the in-memory catalogue table"""
+    categories = {
+        column: value
+        for column, value in (("type", type), ("occasion", occasion), ("gender", gender), ("purity", purity))
+        if value
+    }
+    prices = None
+    if (min_budget is not None or max_budget is not None) and not catalogue_table.prices:
+        # Cost columns are priced on every snapshot; only a cold start needs a price here
+        prices = await get_gold_price()
+    items = catalogue_table.query(
+        categories, featured, min_weight, max_weight, min_budget, max_budget, prices
+    )
+    return ORJSONResponse({"items": items, "count": len(items)})
+
+@app.get("/api/jewellery/{item_id}", response_model=JewelleryRecord)
 async def get_jewellery_item(item_id: str):
     """Get single jewellery item"""
     item = await app.mongodb.jewellery.find_one({"item_id": item_id}, {"_id": 0})
     if not item:
         raise HTTPException(status_code=404, detail="Item not found")
-    return item
+    return ORJSONResponse(item)
+
+async def fetch_similar_items(item_id: str, limit: int) -> List[dict]:
+    """Neighbour documents in similarity order; 404 for unknown items"""
+    neighbours = similarity_index.neighbours.get(item_id)
+    if neighbours is None:
+        raise HTTPException(status_code=404, detail="Item not found")
+    neighbour_ids = [other for _, other in neighbours[:limit]]
+    found = {
+        item["item_id"]: item
+        for item in await app.mongodb.jewellery.find(
+            {"item_id": {"$in": neighbour_ids}}, {"_id": 0}
+        ).to_list(len(neighbour_ids))
+    }
+    return [found[other] for other in neighbour_ids if other in found]
+
+@app.get("/api/jewellery/{item_id}/similar", response_model=JewelleryList)
+async def get_similar_jewellery(item_id: str, limit: int = Query(default=4, ge=1, le=SIMILAR_ITEMS_COUNT)):
+    """Get precomputed similar items for a product"""
+    items = await fetch_similar_items(item_id, limit)
+    return ORJSONResponse({"items": items, "count": len(items)})
 
 @app.post("/api/jewellery")
 async def create_jewellery(item: JewelleryItem):
     """Create new jewellery item"""
     item_data = item.model_dump()
+    item_data["image_variants"] = build_image_variants(item_data["images"])
     item_data["created_at"] = datetime.now(timezone.utc).isoformat()
     await app.mongodb.jewellery.insert_one({**item_data})
+    catalogue_table.add_item(item_data)
+    await merge_similar_items(similarity_index.add_item(item_data))
+    await bump_catalogue_version()
     return {"status": "success", "item_id": item_data["item_id"]}
 
+# ==================== BOOTSTRAP ====================
+
+async def fetch_goldsmith_profile() -> Optional[dict]:
+    return await app.mongodb.goldsmith.find_one({}, {"_id": 0})
+
+@app.get("/api/bootstrap")
+async def get_bootstrap():
+    """Home page data in one round-trip: featured items, goldsmith profile and prices"""
+    featured = catalogue_table.query(featured=True)
+    profile, prices = await asyncio.gather(fetch_goldsmith_profile(), get_gold_price())
+    return ORJSONResponse({
+        "featured": {"items": featured, "count": len(featured)},
+        "goldsmith": profile,
+        "gold_price": prices
+    })
+
+@app.get("/api/bootstrap/item/{item_id}")
+async def get_item_bootstrap(item_id: str):
+    """Product page data in one round-trip: item, prices and similar items"""
+    item, prices, similar = await asyncio.gather(
+        app.mongodb.jewellery.find_one({"item_id": item_id}, {"_id": 0}),
+        get_gold_price(),
+        fetch_similar_items(item_id, 4),
+        return_exceptions=True
+    )
+    if isinstance(item, Exception):
+        raise item
+    if not item:
+        raise HTTPException(status_code=404, detail="Item not found")
+    if isinstance(prices, Exception):
+        raise prices
+    if isinstance(similar, Exception):
+        # Item added on another worker and not yet indexed here
+        similar = []
+    return ORJSONResponse({
+        "item": item,
+        "gold_price": prices,
+        "similar": {"items": similar, "count": len(similar)}
+    })
+
 # ==================== AI CHAT ASSISTANT ====================
 
-@app.post("/api/chat")
-async def chat_with_assistant(chat: ChatMessage):
-    """AI-powered jewellery assistant"""
-    try:
-        from emergentintegrations.llm.chat import LlmChat, UserMessage
-        
-        # Get current gold prices for context
-        prices = await get_gold_price()
-        
-        # Get catalogue summary for context
-        jewellery_items = await app.mongodb.jewellery.find({}, {"_id": 0}).to_list(50)
-        catalogue_summary = "\n".join([
-            f"- {item['name']}: {item['type']}, {item['purity']}, {item['weight_min']}-{item['weight_max']}g, ₹{item['labour_cost_per_gram']}/g labour"
-            for item in jewellery_items[:20]
-        ])
-        
-        system_message = f"""You are an expert jewellery consultant for a traditional Indian goldsmith. 
+CHAT_CONTEXT_MESSAGES = 10  # history replayed into a fresh session
+CHAT_CACHE_MAX_MESSAGES = 30  # cached sessions beyond this are rebuilt from the last 10
+CHAT_PRICE_TOLERANCE = 0.005  # relative move before a live session is told the new prices
+
+class ChatSession:
+    """A live LlmChat plus what the cache needs to account for it"""
+    __slots__ = ("llm_chat", "prices", "messages", "size", "last_used")
+
+    def __init__(self, llm_chat, prices: dict, messages: int, size: int):
+        self.llm_chat = llm_chat
+        self.prices = {key: prices[key] for key in PRICE_KEYS}  # rates the model last saw
+        self.messages = messages
+        self.size = size
+        self.last_used = time.monotonic()
+
+class ChatSessionCache:
+    """LRU of recently active chat sessions with idle TTL and a memory cap (per worker)"""
+
+    def __init__(self, max_sessions: int, max_bytes: int, idle_seconds: float):
+        self.max_sessions = max_sessions
+        self.max_bytes = max_bytes
+        self.idle_seconds = idle_seconds
+        self.sessions = OrderedDict()  # least recently used first
+        self.total_bytes = 0
+
+    def _drop_oldest(self):
+        _, session = self.sessions.popitem(last=False)
+        self.total_bytes -= session.size
+
+    def evict(self):
+        """Drop idle sessions, then the least recently used until under both caps"""
+        cutoff = time.monotonic() - self.idle_seconds
+        while self.sessions and next(iter(self.sessions.values())).last_used < cutoff:
+            self._drop_oldest()
+        while self.sessions and (len(self.sessions) > self.max_sessions or self.total_bytes > self.max_bytes):
+            self._drop_oldest()
+
+    def take(self, session_id: str) -> Optional[ChatSession]:
+        """Remove and return a reusable session; concurrent turns for it then rehydrate"""
+        self.evict()
+        session = self.sessions.pop(session_id, None)
+        if session is None:
+            return None
+        self.total_bytes -= session.size
+        if session.messages >= CHAT_CACHE_MAX_MESSAGES:
+            # Context grown too long: rebuild from the most recent history
+            return None
+        return session
+
+    def put(self, session_id: str, session: ChatSession):
+        session.last_used = time.monotonic()
+        self.sessions[session_id] = session
+        self.total_bytes += session.size
+        self.evict()
+
+chat_sessions = ChatSessionCache(CHAT_CACHE_MAX_SESSIONS, CHAT_CACHE_MAX_BYTES, CHAT_CACHE_IDLE_SECONDS)
+
+async def create_chat_session(session_id: str, prices: dict) -> ChatSession:
+    """Build a fresh LlmChat and replay recent history from Mongo (cache miss path)"""
+    # Get catalogue summary for context
+    jewellery_items = await app.mongodb.jewellery.find({}, {"_id": 0}).to_list(50)
+    catalogue_summary = "\n".join([
+        f"- {item['name']}: {item['type']}, {item['purity']}, {item['weight_min']}-{item['weight_max']}g, ₹{item['labour_cost_per_gram']}/g labour"
+        for item in jewellery_items[:20]
+    ])
+    
+    system_message = f"""You are an expert jewellery consultant for a traditional Indian goldsmith. 
 Your role is to help customers discover the perfect jewellery based on their needs.
 
 CURRENT GOLD PRICES (per gram):
@@ -339,33 +1797,87 @@ GUIDELINES:
 
 Keep responses concise and helpful. Use Indian Rupees (₹) for all prices."""
 
-        # Get chat history
-        history = await app.mongodb.chat_history.find(
-            {"session_id": chat.session_id}, {"_id": 0}
-        ).sort("timestamp", 1).to_list(20)
-        
+    # Get chat history, including turns still in the write buffer
+    await write_buffer.flush("chat_history")
+    history = await app.mongodb.chat_history.find(
+        {"session_id": session_id}, {"_id": 0}
+    ).sort("timestamp", 1).to_list(20)
+    
+    if upstream_is_simulated("llm"):
+        llm_chat = SimulatedLlmChat()
+    else:
+        from emergentintegrations.llm.chat import LlmChat
         llm_chat = LlmChat(
             api_key=os.environ.get("EMERGENT_LLM_KEY"),
-            session_id=chat.session_id,
+            session_id=session_id,
             system_message=system_message
         ).with_model("openai", "gpt-4o-mini")
+    
+    # Add history to context
+    recent = history[-CHAT_CONTEXT_MESSAGES:]
+    for msg in recent:
+        if msg["role"] == "user":
+            llm_chat.add_user_message(msg["content"])
+        else:
+            llm_chat.add_assistant_message(msg["content"])
+    
+    return ChatSession(
+        llm_chat,
+        prices,
+        messages=len(recent),
+        size=len(system_message) + sum(len(msg["content"]) for msg in recent)
+    )
+
+def chat_price_update(session: ChatSession, prices: dict) -> Optional[str]:
+    """Price line to send with the next turn when rates moved past the tolerance"""
+    if all(abs(prices[key] - seen) <= CHAT_PRICE_TOLERANCE * seen for key, seen in session.prices.items()):
+        return None
+    session.prices = {key: prices[key] for key in PRICE_KEYS}
+    return (
+        f"[Updated prices per gram: 24K Gold ₹{prices['gold_24k']}, 22K Gold ₹{prices['gold_22k']}, "
+        f"18K Gold ₹{prices['gold_18k']}, Silver ₹{prices['silver']}]"
+    )
+
+async def send_chat_message(llm_chat, text: str) -> str:
+    """Send one user turn through the llm upstream"""
+    async def live_call():
+        from emergentintegrations.llm.chat import UserMessage
+        return await llm_chat.send_message(UserMessage(text=text))
+    return await call_upstream("llm", {"text": text}, live_call)
+
+@app.post("/api/chat")
+async def chat_with_assistant(chat: ChatMessage, http_response: Response):
+    """AI-powered jewellery assistant"""
+    try:
+        # Get current gold prices for context
+        prices = await get_gold_price()
         
-        # Add history to context
-        for msg in history[-10:]:  # Last 10 messages
-            if msg["role"] == "user":
-                llm_chat.add_user_message(msg["content"])
-            else:
-                llm_chat.add_assistant_message(msg["content"])
+        # Reuse the live context for active conversations; rehydrate on a miss
+        session = chat_sessions.take(chat.session_id)
+        cache_status = "hit"
+        if session is None:
+            session = await create_chat_session(chat.session_id, prices)
+            cache_status = "miss"
         
-        user_message = UserMessage(text=chat.message)
-        response = await llm_chat.send_message(user_message)
+        # Prices in the system prompt may be stale; tell the model when they moved
+        text = chat.message
+        price_update = chat_price_update(session, prices)
+        if price_update:
+            text = f"{price_update}\n\n{text}"
+        
+        response = await send_chat_message(session.llm_chat, text)
+        session.messages += 2
+        session.size += len(text) + len(response)
+        chat_sessions.put(chat.session_id, session)
+        http_response.headers["X-Chat-Cache"] = cache_status
         
         # Store messages in history
         timestamp = datetime.now(timezone.utc).isoformat()
-        await app.mongodb.chat_history.insert_many([
+        await write_buffer.insert(
+            "chat_history",
             {"session_id": chat.session_id, "role": "user", "content": chat.message, "timestamp": timestamp},
             {"session_id": chat.session_id, "role": "assistant", "content": response, "timestamp": timestamp}
-        ])
+        )
         
         return {"response": response, "session_id": chat.session_id}
         
@@ -379,16 +1891,23 @@ Keep responses concise and helpful. Use Indian Rupees (₹) for all prices."""
 
 # ==================== ORDER INTENT ====================
 
-async def send_telegram_notification(message: str):
-    """Send notification via Telegram"""
-    if not TELEGRAM_BOT_TOKEN or not TELEGRAM_CHAT_ID:
+async def send_telegram_notification(message: str, chat_id: Optional[str] = None):
+    """Send notification via Telegram (to the shop's chat unless chat_id is given)"""
+    chat_id = chat_id or TELEGRAM_CHAT_ID
+    if not upstream_is_simulated("telegram") and (not TELEGRAM_BOT_TOKEN or not chat_id):
         return False
-    try:
+    payload = {"chat_id": chat_id, "text": message, "parse_mode": "HTML"}
+    
+    async def live_call():
         async with httpx.AsyncClient() as client:
-            await client.post(
+            response = await client.post(
                 f"https://api.telegram.org/bot{TELEGRAM_BOT_TOKEN}/sendMessage",
-                json={"chat_id": TELEGRAM_CHAT_ID, "text": message, "parse_mode": "HTML"}
+                json=payload
             )
+        return response.json()
+    
+    try:
+        await call_upstream("telegram", payload, live_call)
         return True
     except Exception as e:
         print(f"Telegram error: {e}")
@@ -396,7 +1915,7 @@ async def send_telegram_notification(message: str):
 
 async def send_email_notification(to_email: str, subject: str, html_content: str):
     """Send notification via Resend"""
-    if not os.environ.get("RESEND_API_KEY"):
+    if not upstream_is_simulated("resend") and not os.environ.get("RESEND_API_KEY"):
         return False
     try:
         params = {
@@ -405,21 +1924,63 @@ async def send_email_notification(to_email: str, subject: str, html_content: str
             "subject": subject,
             "html": html_content
         }
-        await asyncio.to_thread(resend.Emails.send, params)
+        await call_upstream("resend", params, lambda: asyncio.to_thread(resend.Emails.send, params))
         return True
     except Exception as e:
         print(f"Email error: {e}")
         return False
 
+async def reprice_order_lines(lines: List[OrderLine]):
+    """Price every line against the catalogue and the current snapshot (one $in query)"""
+    item_ids = list({line.item_id for line in lines})
+    catalogue = {
+        item["item_id"]: item
+        for item in await app.mongodb.jewellery.find(
+            {"item_id": {"$in": item_ids}},
+            {"_id": 0, "item_id": 1, "name": 1, "purity": 1, "weight_min": 1, "weight_max": 1, "labour_cost_per_gram": 1}
+        ).to_list(len(item_ids))
+    }
+    missing = [item_id for item_id in item_ids if item_id not in catalogue]
+    if missing:
+        raise HTTPException(status_code=400, detail=f"Unknown item(s): {', '.join(sorted(missing))}")
+    
+    prices = await get_gold_price()
+    priced_lines = []
+    for line in lines:
+        item = catalogue[line.item_id]
+        gold_rate = purity_rate(prices, item["purity"])
+        labour = item["labour_cost_per_gram"]
+        avg_weight = (item["weight_min"] + item["weight_max"]) / 2
+        priced_lines.append({
+            "item_id": item["item_id"],
+            "name": item["name"],
+            "purity": item["purity"],
+            "weight_min": item["weight_min"],
+            "weight_max": item["weight_max"],
+            "gold_rate_per_gram": round(gold_rate, 2),
+            "labour_per_gram": labour,
+            "estimate": round(estimate_price(gold_rate, avg_weight, labour), 2),
+            "estimate_min": round(estimate_price(gold_rate, item["weight_min"], labour), 2),
+            "estimate_max": round(estimate_price(gold_rate, item["weight_max"], labour), 2),
+            "client_estimate": line.estimate
+        })
+    return priced_lines, prices
+
 @app.post("/api/order-intent")
 async def create_order_intent(order: OrderIntent):
     """Save order intent and send notifications"""
     order_data = order.model_dump()
+    priced_lines, prices = await reprice_order_lines(order.items)
+    order_data["items"] = priced_lines
+    order_data["client_total_estimate"] = order.total_estimate
+    order_data["total_estimate"] = round(sum(line["estimate"] for line in priced_lines), 2)
+    order_data["price_timestamp"] = prices["timestamp"]
     order_data["order_id"] = str(uuid.uuid4())[:8].upper()
     order_data["status"] = "pending"
     order_data["created_at"] = datetime.now(timezone.utc).isoformat()
     
     await app.mongodb.order_intents.insert_one({**order_data})
+    record_rollup(order_data["created_at"], order_rollup_increments(order_data))
     
     # Format items for notification
     items_text = "\n".join([
@@ -472,6 +2033,7 @@ async def create_order_intent(order: OrderIntent):
     return {
         "status": "success",
         "order_id": order_data["order_id"],
+        "total_estimate": order_data["total_estimate"],
         "message": "Your order intent has been saved. We will contact you shortly!"
     }
 
@@ -485,6 +2047,7 @@ async def submit_contact(form: ContactForm):
     form_data["created_at"] = datetime.now(timezone.utc).isoformat()
     
     await app.mongodb.contacts.insert_one({**form_data})
+    record_rollup(form_data["created_at"], contact_rollup_increments(form_data))
     
     # Send Telegram notification
     telegram_msg = f"""📩 <b>New Contact Inquiry</b>
@@ -505,6 +2068,146 @@ async def submit_contact(form: ContactForm):
         "message": "Thank you for your message. We will get back to you soon!"
     }
 
+# ==================== LEAD ANALYTICS ====================
+
+def check_admin_key(x_admin_key: Optional[str]):
+    """Reject admin calls without the configured key; fail closed when none is set"""
+    if not ADMIN_API_KEY:
+        raise HTTPException(status_code=503, detail="Admin API is not configured")
+    if not hmac.compare_digest(x_admin_key or "", ADMIN_API_KEY):
+        raise HTTPException(status_code=401, detail="Admin key required")
+
+# One year of daily rollups per analytics request
+ANALYTICS_MAX_DAYS = 366
+
+# Client-supplied dimensions, bounded to the frontend's <select> values so a
+# scripted client cannot add unlimited fields to a day's rollup document
+ROLLUP_VALUES = {
+    "occasion": {"wedding", "engagement", "festival", "gift", "personal", "other"},
+    "timeline": {"immediate", "2-weeks", "1-month", "2-months", "flexible"},
+    "subject": {"general", "custom", "pricing", "visit", "other"}
+}
+
+def rollup_key(value, dimension: Optional[str] = None) -> str:
+    """Make a value safe as a Mongo field name; unknown values of bounded dimensions become other"""
+    if not value:
+        return "unknown"
+    if dimension in ROLLUP_VALUES and value not in ROLLUP_VALUES[dimension]:
+        return "other"
+    return str(value).replace(".", "_").replace("$", "_")
+
+def order_rollup_increments(order_data: dict) -> dict:
+    """$inc paths for one order intent: totals plus per occasion/timeline/status"""
+    value = order_data["total_estimate"]
+    increments = {"orders.count": 1, "orders.value": value}
+    for dimension in ("occasion", "timeline", "status"):
+        key = rollup_key(order_data.get(dimension), dimension)
+        increments[f"orders.by_{dimension}.{key}.count"] = 1
+        increments[f"orders.by_{dimension}.{key}.value"] = value
+    return increments
+
+def contact_rollup_increments(form_data: dict) -> dict:
+    """$inc paths for one contact inquiry: total plus per subject"""
+    return {
+        "contacts.count": 1,
+        f"contacts.by_subject.{rollup_key(form_data.get('subject'), 'subject')}": 1
+    }
+
+def record_rollup(created_at: str, increments: dict):
+    """Bump the day's counters via the write buffer; analytics must never fail or block the request"""
+    queued = write_buffer.offer(
+        "analytics_daily", UpdateOne({"_id": created_at[:10]}, {"$inc": increments}, upsert=True)
+    )
+    if not queued:
+        # Recoverable with `python server.py rebuild-analytics`
+        print("Analytics rollup dropped: write buffer full")
+
+async def rebuild_analytics() -> int:
+    """Backfill analytics_daily from order_intents and contacts; returns days written"""
+    rollups = {}
+    
+    def accumulate(created_at: str, increments: dict):
+        day = rollups.setdefault(created_at[:10], {})
+        for path, amount in increments.items():
+            day[path] = day.get(path, 0) + amount
+    
+    async for order in app.mongodb.order_intents.find(
+        {}, {"_id": 0, "created_at": 1, "total_estimate": 1, "occasion": 1, "timeline": 1, "status": 1}
+    ):
+        accumulate(order["created_at"], order_rollup_increments(order))
+    async for contact in app.mongodb.contacts.find({}, {"_id": 0, "created_at": 1, "subject": 1}):
+        accumulate(contact["created_at"], contact_rollup_increments(contact))
+    
+    await app.mongodb.analytics_daily.delete_many({})
+    if rollups:
+        await app.mongodb.analytics_daily.bulk_write([
+            UpdateOne({"_id": day}, {"$inc": increments}, upsert=True)
+            for day, increments in rollups.items()
+        ], ordered=False)
+    return len(rollups)
+
+def merge_rollups(total: dict, day: dict):
+    """Sum nested counter dicts into total"""
+    for key, value in day.items():
+        if isinstance(value, dict):
+            merge_rollups(total.setdefault(key, {}), value)
+        else:
+            total[key] = total.get(key, 0) + value
+
+@app.get("/api/admin/analytics")
+async def get_lead_analytics(
+    start: Optional[str] = Query(None, description="First day, YYYY-MM-DD (default: 30 days ago)"),
+    end: Optional[str] = Query(None, description="Last day, YYYY-MM-DD (default: today)"),
+    x_admin_key: Optional[str] = Header(None)
+):
+    """Daily lead counts and values, read from pre-aggregated rollups only"""
+    check_admin_key(x_admin_key)
+    try:
+        end_day = date.fromisoformat(end) if end else datetime.now(timezone.utc).date()
+        start_day = date.fromisoformat(start) if start else end_day - timedelta(days=29)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Dates must be YYYY-MM-DD")
+    if start_day > end_day:
+        raise HTTPException(status_code=400, detail="start must not be after end")
+    if (end_day - start_day).days >= ANALYTICS_MAX_DAYS:
+        raise HTTPException(status_code=400, detail=f"Range must be at most {ANALYTICS_MAX_DAYS} days")
+    
+    await write_buffer.flush("analytics_daily")
+    rollups = await app.mongodb.analytics_daily.find(
+        {"_id": {"$gte": start_day.isoformat(), "$lte": end_day.isoformat()}}
+    ).sort("_id", 1).to_list(ANALYTICS_MAX_DAYS)
+    
+    totals = {}
+    days = []
+    for rollup in rollups:
+        day = rollup.pop("_id")
+        merge_rollups(totals, rollup)
+        days.append({"date": day, **rollup})
+    return {"start": start_day.isoformat(), "end": end_day.isoformat(), "days": days, "totals": totals}
+
+# ==================== ADMIN PROFILES ====================
+
+@app.get("/api/admin/profiles")
+async def list_profiles(x_admin_key: Optional[str] = Header(None)):
+    """List stored request profiles, newest first (admin key required: stacks include server paths)"""
+    check_admin_key(x_admin_key)
+    if not os.path.isdir(PROFILER_DIR):
+        return {"profiles": []}
+    names = sorted((name for name in os.listdir(PROFILER_DIR) if name.endswith(".speedscope.json")), reverse=True)
+    return {"profiles": [
+        {"profile_id": name.removesuffix(".speedscope.json"), "size": os.path.getsize(os.path.join(PROFILER_DIR, name))}
+        for name in names
+    ]}
+
+@app.get("/api/admin/profiles/{profile_id}")
+async def get_profile(profile_id: str, x_admin_key: Optional[str] = Header(None)):
+    """Download one profile (open it at speedscope.app)"""
+    check_admin_key(x_admin_key)
+    path = os.path.join(PROFILER_DIR, f"{profile_id}.speedscope.json")
+    if not PROFILE_ID.match(profile_id) or not os.path.isfile(path):
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return FileResponse(path, media_type="application/json", filename=f"{profile_id}.speedscope.json")
+
 # ==================== CLOUDINARY UPLOAD ====================
 
 @app.get("/api/cloudinary/signature")
@@ -537,15 +2240,163 @@ async def get_cloudinary_signature(
         "resource_type": resource_type
     }
 
+# ==================== IMAGE DERIVATIVES ====================
+
+# Widths per layout slot; formats in browser preference order
+IMAGE_SIZES = {"thumbnail": 160, "card": 480, "detail": 1080}
+IMAGE_FORMATS = ["avif", "webp"]
+CLOUDINARY_UPLOAD_URL = re.compile(r"^https?://res\.cloudinary\.com/(?P<cloud>[^/]+)/image/upload/(?P<path>.+)$")
+CLOUDINARY_VERSION = re.compile(r"^v\d+$")
+# One transformation component, e.g. c_fill,w_500 or t_thumb
+CLOUDINARY_TRANSFORMATION = re.compile(
+    r"^(?:a|ar|b|bo|c|co|dpr|e|f|fl|g|h|l|o|q|r|t|u|w|x|y|z)_[^,]+"
+    r"(?:,(?:a|ar|b|bo|c|co|dpr|e|f|fl|g|h|l|o|q|r|t|u|w|x|y|z)_[^,]+)*$"
+)
+
+def parse_upload_url(source: str) -> Optional[tuple]:
+    """(cloud, version, public_id) of a Cloudinary upload URL, ignoring any transformations"""
+    match = CLOUDINARY_UPLOAD_URL.match(source)
+    if not match:
+        return None
+    segments = match.group("path").split("/")
+    versions = [i for i, segment in enumerate(segments) if CLOUDINARY_VERSION.match(segment)]
+    version = None
+    if versions:
+        # Everything before the version is transformations
+        version = segments[versions[0]][1:]
+        segments = segments[versions[0] + 1:]
+    else:
+        while len(segments) > 1 and CLOUDINARY_TRANSFORMATION.match(segments[0]):
+            segments = segments[1:]
+    public_id = re.sub(r"\.[A-Za-z0-9]+$", "", "/".join(segments))
+    return match.group("cloud"), version, public_id
+
+def derivative_url(source: str, width: int, fetch_format: str) -> str:
+    """Cloudinary URL for one width/format of an image"""
+    options = {"width": width, "crop": "limit", "fetch_format": fetch_format, "quality": "auto"}
+    upload = parse_upload_url(source)
+    if upload and upload[0] == cloudinary.config().cloud_name:
+        # Our own upload: transform the original by public_id
+        _, version, public_id = upload
+        if version:
+            options["version"] = version
+        url, _ = cloudinary.utils.cloudinary_url(public_id, **options)
+    else:
+        # Remote image (e.g. Unsplash): let Cloudinary fetch and cache it
+        url, _ = cloudinary.utils.cloudinary_url(source, type="fetch", **options)
+    return url
+
+def build_image_variants(images: List[str]) -> List[dict]:
+    """srcset-ready derivatives for each image, computed once at write time"""
+    variants = []
+    for source in images:
+        if not cloudinary.config().cloud_name:
+            # Cloudinary not configured: serve the original only
+            variants.append({"original": source, "src": source, "srcset": {}, "sizes": {}})
+            continue
+        sizes = {
+            name: {fmt: derivative_url(source, width, fmt) for fmt in IMAGE_FORMATS}
+            for name, width in IMAGE_SIZES.items()
+        }
+        srcset = {
+            fmt: ", ".join(f"{sizes[name][fmt]} {width}w" for name, width in IMAGE_SIZES.items())
+            for fmt in IMAGE_FORMATS
+        }
+        variants.append({
+            "original": source,
+            "src": derivative_url(source, IMAGE_SIZES["card"], "auto"),
+            "srcset": srcset,
+            "sizes": sizes
+        })
+    return variants
+
+async def backfill_image_variants() -> int:
+    """Recompute image_variants/gallery_variants for every stored document; returns documents updated"""
+    updates = [
+        UpdateOne({"item_id": item["item_id"]}, {"$set": {"image_variants": build_image_variants(item.get("images", []))}})
+        async for item in app.mongodb.jewellery.find({}, {"_id": 0, "item_id": 1, "images": 1})
+    ]
+    if updates:
+        await app.mongodb.jewellery.bulk_write(updates, ordered=False)
+    profiles = 0
+    async for profile in app.mongodb.goldsmith.find({}, {"gallery_images": 1}):
+        await app.mongodb.goldsmith.update_one(
+            {"_id": profile["_id"]},
+            {"$set": {"gallery_variants": build_image_variants(profile.get("gallery_images", []))}}
+        )
+        profiles += 1
+    return len(updates) + profiles
+
 # ==================== EDUCATION CONTENT ====================
 
-@app.get("/api/education")
-async def get_education_content():
-    """Get gold education content"""
+class EducationBundle(NamedTuple):
+    body: bytes
+    etag: str
+    encoded: Dict[str, bytes]  # content-encoding -> precompressed body
+
+# Swapped wholesale on change, never mutated in place
+education_bundle: Optional[EducationBundle] = None
+
+async def load_education_bundle() -> EducationBundle:
+    """Serialize, hash and precompress the articles; keep the old bundle if unchanged"""
+    global education_bundle
     content = await app.mongodb.education.find({}, {"_id": 0}).to_list(20)
-    if not content:
-        return {"articles": get_default_education_content()}
-    return {"articles": content}
+    body = orjson.dumps({"articles": content or get_default_education_content()})
+    etag = f'"{hashlib.sha256(body).hexdigest()[:32]}"'
+    if education_bundle and education_bundle.etag == etag:
+        return education_bundle
+    encoded = {"gzip": compress_body(body, "gzip")}
+    if brotli is not None:
+        encoded["br"] = compress_body(body, "br")
+    education_bundle = EducationBundle(body=body, etag=etag, encoded=encoded)
+    return education_bundle
+
+async def education_refresh_loop():
+    """Rebuild the bundle on collection changes (change stream, or polling on standalone Mongo)"""
+    while True:
+        try:
+            async with app.mongodb.education.watch() as stream:
+                async for _ in stream:
+                    await load_education_bundle()
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            # Change streams need a replica set; poll instead
+            await asyncio.sleep(EDUCATION_REFRESH_SECONDS)
+            try:
+                await load_education_bundle()
+            except Exception as e:
+                print(f"Education refresh error: {e}")
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """Weak comparison of an If-None-Match header against our ETag"""
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") == etag:
+            return True
+    return False
+
+@app.get("/api/education", response_model=EducationContent)
+async def get_education_content(request: Request):
+    """Get gold education content"""
+    bundle = education_bundle or await load_education_bundle()
+    encoding = negotiate_encoding(request.headers.get("accept-encoding", ""))
+    if encoding not in bundle.encoded:
+        encoding = None
+    # Each content-coding is its own representation, so each gets its own strong validator
+    etag = f'{bundle.etag[:-1]}-{encoding}"' if encoding else bundle.etag
+    headers = {
+        "ETag": etag,
+        "Cache-Control": f"public, max-age={EDUCATION_MAX_AGE}",
+        "Vary": "Accept-Encoding"
+    }
+    if etag_matches(request.headers.get("if-none-match", ""), etag):
+        return Response(status_code=304, headers=headers)
+    
+    if encoding:
+        headers["Content-Encoding"] = encoding
+        return Response(bundle.encoded[encoding], media_type="application/json", headers=headers)
+    return Response(bundle.body, media_type="application/json", headers=headers)
 
 def get_default_education_content():
     return [
@@ -633,6 +2484,7 @@ async def seed_initial_data():
                 "https://images.unsplash.com/photo-1611652022419-a9419f74343d"
             ]
         }
+        default_profile["gallery_variants"] = build_image_variants(default_profile["gallery_images"])
         await app.mongodb.goldsmith.insert_one(default_profile)
     
     # Seed jewellery catalogue
@@ -736,12 +2588,54 @@ async def seed_initial_data():
                 "created_at": datetime.now(timezone.utc).isoformat()
             }
         ]
+        for item in sample_jewellery:
+            item["image_variants"] = build_image_variants(item["images"])
         await app.mongodb.jewellery.insert_many(sample_jewellery)
 
 @app.get("/api/health")
 async def health_check():
     return {"status": "healthy", "timestamp": datetime.now(timezone.utc).isoformat()}
 
+async def run_rebuild_analytics():
+    """CLI entry: python server.py rebuild-analytics"""
+    app.mongodb_client = AsyncIOMotorClient(MONGO_URL)
+    app.mongodb = app.mongodb_client[DB_NAME]
+    try:
+        days = await rebuild_analytics()
+        print(f"Rebuilt analytics rollups for {days} day(s)")
+    finally:
+        app.mongodb_client.close()
+
+async def run_rebuild_similar():
+    """CLI entry: python server.py rebuild-similar"""
+    app.mongodb_client = AsyncIOMotorClient(MONGO_URL)
+    app.mongodb = app.mongodb_client[DB_NAME]
+    try:
+        items = await rebuild_similar_items()
+        await bump_catalogue_version()
+        print(f"Rebuilt similar items for {items} item(s)")
+    finally:
+        app.mongodb_client.close()
+
+async def run_rebuild_image_variants():
+    """CLI entry: python server.py rebuild-image-variants"""
+    app.mongodb_client = AsyncIOMotorClient(MONGO_URL)
+    app.mongodb = app.mongodb_client[DB_NAME]
+    try:
+        documents = await backfill_image_variants()
+        # Workers reload their catalogue copy on the version change
+        await bump_catalogue_version()
+        print(f"Rebuilt image variants for {documents} document(s)")
+    finally:
+        app.mongodb_client.close()
+
 if __name__ == "__main__":
-    import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8001)
+    if sys.argv[1:] == ["rebuild-analytics"]:
+        asyncio.run(run_rebuild_analytics())
+    elif sys.argv[1:] == ["rebuild-similar"]:
+        asyncio.run(run_rebuild_similar())
+    elif sys.argv[1:] == ["rebuild-image-variants"]:
+        asyncio.run(run_rebuild_image_variants())
+    else:
+        import uvicorn
+        uvicorn.run(app, host="0.0.0.0", port=8001)
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Performance Benchmarks for Jewellery Platform
+Serialization: default FastAPI JSON vs ORJSONResponse, raw vs gzip/Brotli bytes
+Price alerts: per-tick matching cost with a large subscription index
+Catalogue listings: filtered queries against the in-memory columnar table
+"""
+
+import os
+import random
+import sys
+import time
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend"))
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, ORJSONResponse
+
+import server
+
+
+def catalogue_payload(count=100):
+    """Catalogue listing with long descriptions, as returned by /api/jewellery"""
+    items = []
+    for i in range(count):
+        items.append({
+            "item_id": f"ITEM{i:04d}",
+            "name": f"Temple Necklace Design {i}",
+            "type": "necklace",
+            "occasion": "wedding",
+            "gender": "female",
+            "purity": "22K",
+            "weight_min": 40 + i % 10,
+            "weight_max": 50 + i % 10,
+            "labour_cost_per_gram": 800,
+            "making_complexity": "high",
+            "images": [f"https://images.unsplash.com/photo-{i}-a", f"https://images.unsplash.com/photo-{i}-b"],
+            "description": "Exquisite temple jewellery featuring Goddess Lakshmi motifs. " * 8,
+            "is_featured": i % 3 == 0,
+            "created_at": "2026-02-01T10:00:00+00:00"
+        })
+    return {"items": items, "count": len(items)}
+
+
+def chat_transcript_payload(turns=40):
+    """Chat history shaped like chat_history documents"""
+    return {"messages": [
+        {
+            "session_id": "bench_session",
+            "role": "user" if i % 2 == 0 else "assistant",
+            "content": "For a 22K wedding necklace around 45g, the estimate including labour and GST is... " * 4,
+            "timestamp": "2026-02-01T10:00:00+00:00"
+        }
+        for i in range(turns)
+    ]}
+
+
+def default_render(payload):
+    """What FastAPI does for a plain dict without a response class override"""
+    return JSONResponse(jsonable_encoder(payload)).body
+
+
+def orjson_render(payload):
+    """The fast path: ORJSONResponse returned directly from the handler"""
+    return ORJSONResponse(payload).body
+
+
+def bench(name, payload, number=2000):
+    default_time = timeit.timeit(lambda: default_render(payload), number=number)
+    orjson_time = timeit.timeit(lambda: orjson_render(payload), number=number)
+    body = orjson_render(payload)
+    gzip_size = len(server.compress_body(body, "gzip"))
+    br_size = len(server.compress_body(body, "br")) if server.brotli else None
+
+    print(f"\n{name}")
+    print(f"  default JSON : {default_time / number * 1e6:9.1f} µs/response")
+    print(f"  orjson       : {orjson_time / number * 1e6:9.1f} µs/response  ({default_time / orjson_time:.1f}x faster)")
+    print(f"  raw bytes    : {len(body):9d}")
+    print(f"  gzip bytes   : {gzip_size:9d}  ({len(body) / gzip_size:.1f}x smaller)")
+    if br_size:
+        print(f"  brotli bytes : {br_size:9d}  ({len(body) / br_size:.1f}x smaller)")
+    else:
+        print("  brotli bytes :   (brotli not installed)")
+
+
+def bench_price_alerts(subscriptions=100_000, ticks=200):
+    """Per-tick matching; thresholds and prices share one synthetic range so every key fires"""
+    rng = random.Random(42)
+    index = server.AlertIndex()
+    for i in range(subscriptions):
+        index.add({
+            "alert_id": f"A{i}",
+            "purity": rng.choice(list(server.PRICE_FIELDS)),
+            "direction": rng.choice(server.ALERT_DIRECTIONS),
+            "threshold": rng.uniform(5000, 8000)
+        })
+
+    base = {"gold_24k": 7500.0, "gold_22k": 6875.0, "gold_18k": 5625.0, "silver": 6500.0}
+    matched = 0
+    start = time.perf_counter()
+    for _ in range(ticks):
+        # Small moves around the current rate, as on a real price feed
+        prices = {field: price * rng.uniform(0.999, 1.001) for field, price in base.items()}
+        matched += len(index.pop_matches(prices))
+    elapsed = time.perf_counter() - start
+
+    print(f"\nPrice alert matching ({subscriptions:,} subscriptions)")
+    print(f"  per tick     : {elapsed / ticks * 1e6:9.1f} µs  ({matched:,} alerts fired over {ticks} ticks)")
+
+
+def bench_catalogue_query(rows=10_000, number=2000):
+    """Filtered /api/jewellery listings answered by the catalogue table alone"""
+    rng = random.Random(42)
+    items = catalogue_payload(rows)["items"]
+    for item in items:
+        item["type"] = rng.choice(["ring", "chain", "necklace", "bangles", "earrings"])
+        item["occasion"] = rng.choice(["wedding", "daily", "festival"])
+        item["purity"] = rng.choice(["24K", "22K", "18K"])
+        item["weight_min"] = rng.uniform(2, 80)
+        item["weight_max"] = item["weight_min"] + rng.uniform(0, 15)
+    prices = {"gold_24k": 7500.0, "gold_22k": 6875.0, "gold_18k": 5625.0, "silver": 95.0}
+    table = server.CatalogueTable()
+    table.set_items(items, prices)
+
+    print(f"\nCatalogue listing ({rows:,} rows)")
+    queries = [
+        ("type + occasion", dict(categories={"type": "ring", "occasion": "wedding"})),
+        ("weight overlap", dict(categories={"purity": "22K"}, min_weight=10, max_weight=20)),
+        ("budget range", dict(min_budget=50_000, max_budget=150_000)),
+    ]
+    for name, kwargs in queries:
+        elapsed = timeit.timeit(lambda: table.query(**kwargs), number=number)
+        print(f"  {name:<15}: {elapsed / number * 1e6:9.1f} µs/query  ({len(table.query(**kwargs))} rows)")
+    elapsed = timeit.timeit(lambda: table.reprice(prices), number=number)
+    print(f"  {'reprice':<15}: {elapsed / number * 1e6:9.1f} µs/price tick")
+
+
+def main():
+    """Run all benchmarks"""
+    print("Serialization benchmark (lower µs and fewer bytes are better)")
+    print("=" * 60)
+    bench("Catalogue listing (100 items)", catalogue_payload())
+    bench("Education content", {"articles": server.get_default_education_content()})
+    bench("Chat transcript (40 turns)", chat_transcript_payload())
+    bench_price_alerts()
+    bench_catalogue_query()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -5,6 +5,7 @@ Tests all endpoints for functionality and integration
 """
 
 import requests
+import os
 import sys
 import json
 from datetime import datetime
@@ -17,15 +18,16 @@ class JewelleryAPITester:
         self.tests_passed = 0
         self.failed_tests = []
         self.session = requests.Session()
+        self.admin_key = os.environ.get("ADMIN_API_KEY")  # same key the server was started with
         
     def log(self, message, level="INFO"):
         timestamp = datetime.now().strftime("%H:%M:%S")
         print(f"[{timestamp}] {level}: {message}")
         
-    def run_test(self, name, method, endpoint, expected_status=200, data=None, params=None):
+    def run_test(self, name, method, endpoint, expected_status=200, data=None, params=None, extra_headers=None):
         """Run a single API test"""
         url = f"{self.base_url}/{endpoint}"
-        headers = {'Content-Type': 'application/json'}
+        headers = {'Content-Type': 'application/json', **(extra_headers or {})}
         
         self.tests_run += 1
         self.log(f"Testing {name}...")
@@ -87,7 +89,12 @@ class JewelleryAPITester:
                     self.log(f"❌ Missing field in gold price response: {field}", "FAIL")
                     return False
             self.log(f"   Gold prices: 24K=₹{data['gold_24k']}, 22K=₹{data['gold_22k']}, Source={data['source']}")
-        return success
+
+        # Currencies outside PRICE_CURRENCIES are a client error
+        unknown_success, _ = self.run_test(
+            "Get Gold Prices (unconfigured currency)", "GET", "api/gold-price", 400, params={'currency': 'XXX'}
+        )
+        return success and unknown_success
     
     def test_price_calculator(self):
         """Test price calculator"""
@@ -119,6 +126,16 @@ class JewelleryAPITester:
                 return False
             self.log(f"   Found {len(data['items'])} jewellery items")
             
+            # Listings carry one responsive variant per image for the frontend's <picture>
+            for item in data['items']:
+                variants = item.get('image_variants')
+                if variants is None or len(variants) != len(item.get('images', [])):
+                    self.log(f"❌ Missing image_variants for {item.get('item_id')}", "FAIL")
+                    return False
+                if any('src' not in variant or 'srcset' not in variant for variant in variants):
+                    self.log(f"❌ Incomplete image_variants for {item.get('item_id')}", "FAIL")
+                    return False
+            
             # Test with filters
             filters = {
                 'type': 'necklace',
@@ -129,13 +146,40 @@ class JewelleryAPITester:
             if filter_success:
                 self.log(f"   Filtered results: {len(filter_data.get('items', []))} items")
             
+            # Test budget filter (live price incl. labour and GST)
+            budget_success, budget_data = self.run_test("Get Jewellery By Budget", "GET", "api/jewellery",
+                                                        params={'max_budget': 150000})
+            if budget_success:
+                self.log(f"   Within ₹1.5 lakh: {len(budget_data.get('items', []))} items")
+            
             # Test get single item if items exist
             if data['items']:
                 item_id = data['items'][0]['item_id']
                 single_success, single_data = self.run_test("Get Single Jewellery Item", "GET", f"api/jewellery/{item_id}")
                 if single_success:
                     self.log(f"   Single item: {single_data.get('name', 'Unknown')}")
-                return single_success
+                similar_success, similar_data = self.run_test("Get Similar Jewellery", "GET", f"api/jewellery/{item_id}/similar")
+                if similar_success:
+                    self.log(f"   Similar items: {similar_data.get('count', 0)}")
+                return single_success and similar_success
+        return success
+    
+    def test_bootstrap(self):
+        """Test composite bootstrap endpoints"""
+        success, data = self.run_test("Home Bootstrap", "GET", "api/bootstrap")
+        if success:
+            for field in ['featured', 'goldsmith', 'gold_price']:
+                if field not in data:
+                    self.log(f"❌ Missing field in bootstrap response: {field}", "FAIL")
+                    return False
+            featured = data['featured'].get('items', [])
+            self.log(f"   Featured: {len(featured)} items, 22K=₹{data['gold_price'].get('gold_22k')}")
+            if featured:
+                item_id = featured[0]['item_id']
+                success, item_data = self.run_test("Item Bootstrap", "GET", f"api/bootstrap/item/{item_id}")
+                if success and 'item' not in item_data:
+                    self.log("❌ Missing 'item' in item bootstrap response", "FAIL")
+                    return False
         return success
     
     def test_education_content(self):
@@ -148,6 +192,17 @@ class JewelleryAPITester:
             self.log(f"   Found {len(data['articles'])} education articles")
         return success
     
+    def test_education_conditional_get(self):
+        """Test education ETag revalidation returns 304"""
+        response = self.session.get(f"{self.base_url}/api/education", timeout=10)
+        etag = response.headers.get('ETag')
+        if not etag:
+            self.log("❌ Missing ETag on education response", "FAIL")
+            return False
+        success, _ = self.run_test("Education Not Modified", "GET", "api/education", 304,
+                                   extra_headers={'If-None-Match': etag})
+        return success
+    
     def test_contact_form(self):
         """Test contact form submission"""
         contact_data = {
@@ -174,7 +229,7 @@ class JewelleryAPITester:
             "occasion": "wedding",
             "timeline": "1-month",
             "items": [
-                {"name": "Test Necklace", "item_id": "TEST001", "estimate": 50000}
+                {"name": "Lakshmi Temple Necklace", "item_id": "NECK001", "estimate": 50000}
             ],
             "total_estimate": 50000,
             "message": "Test order intent from automated testing"
@@ -185,6 +240,69 @@ class JewelleryAPITester:
                 self.log("❌ Missing 'order_id' in order intent response", "FAIL")
                 return False
             self.log(f"   Order intent ID: {data['order_id']}")
+            self.log(f"   Server-priced total: ₹{data.get('total_estimate')}")
+            
+            # Unknown catalogue items are rejected
+            order_data["items"] = [{"name": "Test Necklace", "item_id": "TEST001", "estimate": 50000}]
+            reject_success, _ = self.run_test("Reject Unknown Order Item", "POST", "api/order-intent", 400, order_data)
+            return reject_success
+        return success
+    
+    def test_lead_analytics(self):
+        """Test lead analytics rollup endpoint"""
+        if not self.admin_key:
+            # Admin endpoints fail closed when the server has no key configured
+            success, _ = self.run_test("Lead Analytics (admin disabled)", "GET", "api/admin/analytics", 503)
+            return success
+        denied, _ = self.run_test("Lead Analytics (no key)", "GET", "api/admin/analytics", 401)
+        success, data = self.run_test("Lead Analytics", "GET", "api/admin/analytics",
+                                      extra_headers={'X-Admin-Key': self.admin_key})
+        if success:
+            if 'days' not in data or 'totals' not in data:
+                self.log("❌ Missing 'days' or 'totals' in analytics response", "FAIL")
+                return False
+            orders = data['totals'].get('orders', {})
+            self.log(f"   {len(data['days'])} day(s), {orders.get('count', 0)} order intent(s)")
+        too_long, _ = self.run_test("Lead Analytics (range too long)", "GET", "api/admin/analytics", 400,
+                                    params={'start': '2024-01-01', 'end': '2025-06-30'},
+                                    extra_headers={'X-Admin-Key': self.admin_key})
+        reversed_range, _ = self.run_test("Lead Analytics (start after end)", "GET", "api/admin/analytics", 400,
+                                          params={'start': '2025-02-01', 'end': '2025-01-01'},
+                                          extra_headers={'X-Admin-Key': self.admin_key})
+        return denied and success and too_long and reversed_range
+    
+    def test_admin_profiles(self):
+        """Test request profiles are never listed without the admin key"""
+        expected = 401 if self.admin_key else 503
+        success, _ = self.run_test("List Profiles (no key)", "GET", "api/admin/profiles", expected)
+        if success and self.admin_key:
+            success, data = self.run_test("List Profiles", "GET", "api/admin/profiles",
+                                          extra_headers={'X-Admin-Key': self.admin_key})
+            if success:
+                self.log(f"   {len(data.get('profiles', []))} stored profile(s)")
+        return success
+    
+    def test_price_alerts(self):
+        """Test price alert subscribe and cancel"""
+        alert_data = {
+            "purity": "22K",
+            "direction": "below",
+            "threshold": 1000,
+            "email": "alerts@example.com"
+        }
+        probe = self.session.post(f"{self.base_url}/api/price-alerts", json=alert_data, timeout=10)
+        if probe.status_code == 503:
+            # Alerts are refused when the server cannot deliver them (no RESEND_API_KEY)
+            self.log("   Note: email delivery not configured, alert creation refused (expected)", "INFO")
+            return True
+        if probe.status_code == 200:
+            self.session.delete(f"{self.base_url}/api/price-alerts/{probe.json()['alert_id']}", timeout=10)
+        success, data = self.run_test("Create Price Alert", "POST", "api/price-alerts", 200, alert_data)
+        if success:
+            if 'alert_id' not in data:
+                self.log("❌ Missing 'alert_id' in price alert response", "FAIL")
+                return False
+            success, _ = self.run_test("Cancel Price Alert", "DELETE", f"api/price-alerts/{data['alert_id']}")
         return success
     
     def test_ai_chat(self):
@@ -201,6 +319,25 @@ class JewelleryAPITester:
             self.log(f"   AI response length: {len(data['response'])} characters")
         return success
     
+    def test_ai_chat_session_cache(self):
+        """Test a second turn on the same session reuses the cached live session"""
+        session_id = f"test_session_{uuid.uuid4().hex[:8]}"
+        first = self.session.post(f"{self.base_url}/api/chat", timeout=30,
+                                  json={"message": "Show me wedding necklaces", "session_id": session_id})
+        if first.headers.get('X-Chat-Cache') != 'miss':
+            self.log("   Note: chat assistant unavailable, session cache not checked", "INFO")
+            return True
+        self.tests_run += 1
+        second = self.session.post(f"{self.base_url}/api/chat", timeout=30,
+                                   json={"message": "Something lighter, around 20g?", "session_id": session_id})
+        if second.headers.get('X-Chat-Cache') != 'hit':
+            self.log(f"❌ Second chat turn was not a cache hit: {second.headers.get('X-Chat-Cache')}", "FAIL")
+            self.failed_tests.append({"test": "AI Chat Session Cache", "endpoint": "api/chat"})
+            return False
+        self.tests_passed += 1
+        self.log("✅ AI Chat Session Cache - second turn hit", "PASS")
+        return True
+    
     def test_cloudinary_signature(self):
         """Test Cloudinary signature generation"""
         params = {'resource_type': 'image', 'folder': 'jewellery'}
@@ -222,10 +359,16 @@ class JewelleryAPITester:
             self.test_price_calculator,
             self.test_goldsmith_profile,
             self.test_jewellery_catalogue,
+            self.test_bootstrap,
             self.test_education_content,
+            self.test_education_conditional_get,
             self.test_contact_form,
             self.test_order_intent,
+            self.test_lead_analytics,
+            self.test_admin_profiles,
+            self.test_price_alerts,
             self.test_ai_chat,
+            self.test_ai_chat_session_cache,
             self.test_cloudinary_signature
         ]
         
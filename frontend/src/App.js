@@ -1,5 +1,5 @@
 import React, { useState, useEffect } from 'react';
-import { BrowserRouter as Router, Routes, Route, Link, useLocation } from 'react-router-dom';
+import { BrowserRouter as Router, Routes, Route, Link, useLocation, useParams } from 'react-router-dom';
 import { Toaster, toast } from 'sonner';
 import {
   Menu, X, ShoppingBag, Phone, Mail, MapPin,
@@ -195,14 +195,10 @@ const HomePage = () => {
   useEffect(() => {
     const fetchData = async () => {
       try {
-        const [jewelleryRes, profileRes, pricesRes] = await Promise.all([
-          axios.get(`${API_URL}/api/jewellery?featured=true`),
-          axios.get(`${API_URL}/api/goldsmith`),
-          axios.get(`${API_URL}/api/gold-price`)
-        ]);
-        setFeatured(jewelleryRes.data.items || []);
-        setProfile(profileRes.data);
-        setPrices(pricesRes.data);
+        const res = await axios.get(`${API_URL}/api/bootstrap`);
+        setFeatured(res.data.featured?.items || []);
+        setProfile(res.data.goldsmith);
+        setPrices(res.data.gold_price);
       } catch (err) {
         console.error('Failed to fetch data');
       }
@@ -341,7 +337,7 @@ const HomePage = () => {
 
           <div className="grid md:grid-cols-2 lg:grid-cols-3 gap-8">
             {featured.slice(0, 6).map((item, i) => (
-              <ProductCard key={item.item_id} item={item} index={i} />
+              <ProductCard key={item.item_id} item={item} index={i} prices={prices} />
             ))}
           </div>
         </div>
@@ -408,14 +404,39 @@ const HomePage = () => {
   );
 };
 
+// ==================== PRODUCT IMAGE ====================
+// Serves the precomputed image_variants: AVIF/WebP sources sized by the browser,
+// falling back to the card-sized src or the original upload
+const ProductImage = ({ item, index = 0, sizes, fallback, alt, className, loading = 'lazy' }) => {
+  const variant = item.image_variants?.[index];
+  return (
+    <picture className="contents">
+      {Object.entries(variant?.srcset || {}).map(([format, srcSet]) => (
+        <source key={format} type={`image/${format}`} srcSet={srcSet} sizes={sizes} />
+      ))}
+      <img
+        src={variant?.src || item.images?.[index] || fallback}
+        alt={alt || item.name}
+        className={className}
+        loading={loading}
+        decoding="async"
+      />
+    </picture>
+  );
+};
+
 // ==================== PRODUCT CARD ====================
-const ProductCard = ({ item, index }) => {
+const ProductCard = ({ item, index, prices: sharedPrices }) => {
   const { addToCart } = useCart();
-  const [prices, setPrices] = useState(null);
+  const [prices, setPrices] = useState(sharedPrices || null);
   
   useEffect(() => {
+    if (sharedPrices) {
+      setPrices(sharedPrices);
+      return;
+    }
     axios.get(`${API_URL}/api/gold-price`).then(res => setPrices(res.data));
-  }, []);
+  }, [sharedPrices]);
   
   const getEstimate = () => {
     if (!prices) return 0;
@@ -436,9 +457,10 @@ const ProductCard = ({ item, index }) => {
       data-testid={`product-card-${item.item_id}`}
     >
       <div className="relative overflow-hidden aspect-square">
-        <img 
-          src={item.images?.[0] || 'https://via.placeholder.com/400'} 
-          alt={item.name}
+        <ProductImage
+          item={item}
+          sizes="(min-width: 1024px) 33vw, (min-width: 768px) 50vw, 100vw"
+          fallback="https://via.placeholder.com/400"
           className="w-full h-full object-cover transition-transform duration-700 group-hover:scale-105"
         />
         <div className="absolute top-4 left-4 flex gap-2">
@@ -1296,18 +1318,20 @@ const ProductDetailPage = () => {
   const { addToCart } = useCart();
   const [item, setItem] = useState(null);
   const [prices, setPrices] = useState(null);
+  const [similar, setSimilar] = useState([]);
   const [selectedImage, setSelectedImage] = useState(0);
-  const itemId = window.location.pathname.split('/').pop();
+  const { id: itemId } = useParams();
 
   useEffect(() => {
+    // Similar Pieces links stay on this route: reset for the new product
+    window.scrollTo(0, 0);
+    setSelectedImage(0);
     const fetchData = async () => {
       try {
-        const [itemRes, pricesRes] = await Promise.all([
-          axios.get(`${API_URL}/api/jewellery/${itemId}`),
-          axios.get(`${API_URL}/api/gold-price`)
-        ]);
-        setItem(itemRes.data);
-        setPrices(pricesRes.data);
+        const res = await axios.get(`${API_URL}/api/bootstrap/item/${itemId}`);
+        setItem(res.data.item);
+        setPrices(res.data.gold_price);
+        setSimilar(res.data.similar?.items || []);
       } catch (err) {
         toast.error('Failed to load product');
       }
@@ -1353,15 +1377,18 @@ const ProductDetailPage = () => {
           {/* Images */}
           <div className="lg:sticky lg:top-32 lg:h-fit">
             <div className="aspect-square overflow-hidden bg-gray-100">
-              <img
-                src={item.images?.[selectedImage] || item.images?.[0] || 'https://via.placeholder.com/800'}
-                alt={item.name}
+              <ProductImage
+                item={item}
+                index={item.images?.[selectedImage] ? selectedImage : 0}
+                sizes="(min-width: 1024px) 50vw, 100vw"
+                fallback="https://via.placeholder.com/800"
+                loading="eager"
                 className="w-full h-full object-cover"
               />
             </div>
             {item.images?.length > 1 && (
               <div className="grid grid-cols-4 gap-4 mt-4">
-                {item.images.slice(0, 4).map((img, i) => (
+                {item.images.slice(0, 4).map((_, i) => (
                   <button
                     key={i}
                     onClick={() => setSelectedImage(i)}
@@ -1369,7 +1396,13 @@ const ProductDetailPage = () => {
                       selectedImage === i ? 'ring-2 ring-emerald-900' : 'hover:opacity-80'
                     }`}
                   >
-                    <img src={img} alt={`${item.name} ${i + 1}`} className="w-full h-full object-cover" />
+                    <ProductImage
+                      item={item}
+                      index={i}
+                      sizes="(min-width: 1024px) 12vw, 25vw"
+                      alt={`${item.name} ${i + 1}`}
+                      className="w-full h-full object-cover"
+                    />
                   </button>
                 ))}
               </div>
@@ -1445,6 +1478,19 @@ const ProductDetailPage = () => {
             </div>
           </div>
         </div>
+
+        {/* Similar Pieces */}
+        {similar.length > 0 && (
+          <section className="mt-20" data-testid="similar-section">
+            <p className="font-accent italic text-gold-dark mb-2">You May Also Like</p>
+            <h2 className="font-display text-3xl font-bold text-emerald-900 mb-8">Similar Pieces</h2>
+            <div className="grid md:grid-cols-2 lg:grid-cols-4 gap-8">
+              {similar.map((similarItem, i) => (
+                <ProductCard key={similarItem.item_id} item={similarItem} index={i} prices={prices} />
+              ))}
+            </div>
+          </section>
+        )}
       </div>
     </div>
   );
@@ -1506,9 +1552,10 @@ const CartPage = () => {
             <div className="bg-white mb-8">
               {cart.map((item, i) => (
                 <div key={item.item_id} className={`flex gap-4 p-6 ${i > 0 ? 'border-t border-gray-100' : ''}`} data-testid={`cart-item-${item.item_id}`}>
-                  <img 
-                    src={item.images?.[0] || 'https://via.placeholder.com/100'} 
-                    alt={item.name}
+                  <ProductImage
+                    item={item}
+                    sizes="96px"
+                    fallback="https://via.placeholder.com/100"
                     className="w-24 h-24 object-cover"
                   />
                   <div className="flex-1">